@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Script for measuring how long it takes to read TEI documents with long
+divisions. Run from the root of the repository:
+
+    python -m benchmarks.tei [sentences per division, ...]
+"""
+import sys
+from time import perf_counter
+
+from corpus2alpino.models import CollectedFile
+from corpus2alpino.readers.tei import TeiReader
+from corpus2alpino.readers.tokenizer import RuleTokenizer
+
+args = sys.argv[1:]
+sizes = [int(arg) for arg in args] if args else [100, 1000, 4000]
+
+
+def create_tei(sentences: int, markup: bool) -> str:
+    words = ['Dit', 'is', 'zin', 'nummer', '{0}', 'met', '<hi rend="italic">opmaak</hi>',
+             'en', 'een', '<w lemma="woord" pos="N">woord</w>'] if markup else \
+        ['Dit', 'is', 'zin', 'nummer', '{0}', 'zonder', 'opmaak']
+    paragraph = ' '.join(' '.join(words).format(i) + '.' for i in range(sentences))
+    return '<TEI xmlns="http://www.tei-c.org/ns/1.0"><teiHeader/><text><body>' + \
+        '<div><p>{0}</p></div></body></text></TEI>'.format(paragraph)
+
+
+# the rule-based tokenizer keeps the tokenization out of the measurement
+reader = TeiReader(RuleTokenizer())
+for markup in [False, True]:
+    for size in sizes:
+        collected_file = CollectedFile(
+            '', 'benchmark.xml', '', create_tei(size, markup))
+        start = perf_counter()
+        utterances = sum(len(list(document.utterances))
+                         for document in reader.read(collected_file))
+        print("{0} sentences{1}: {2} utterances in {3:.2f} seconds".format(
+            size, " with markup" if markup else "", utterances, perf_counter() - start))
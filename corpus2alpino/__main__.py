@@ -3,18 +3,55 @@
 Entry point for converting FoLiA xml files to Alpino XML files.
 """
 
+import os
+import shlex
 import sys
 import argparse
-from tqdm import tqdm
+from typing import List, Optional, Tuple, TYPE_CHECKING
 
-from corpus2alpino.annotators.alpino import AlpinoAnnotator
-from corpus2alpino.annotators.enrich_lassy import EnrichLassyAnnotator
+from corpus2alpino.abstracts import Collector
+from corpus2alpino.collectors.archive import ArchiveCollector
 from corpus2alpino.collectors.filesystem import FilesystemCollector
-from corpus2alpino.targets.filesystem import FilesystemTarget
-from corpus2alpino.writers.lassy import LassyWriter
-
 from corpus2alpino.converter import Converter
 
+# the other modules are only imported when they are used: this keeps
+# the startup time of small conversions low
+if TYPE_CHECKING:
+    from corpus2alpino.annotators.alpino import LengthPolicy
+    from corpus2alpino.annotators.alpino_client import AlpinoClient
+
+
+def parse_servers(value: str) -> List[Tuple[str, int]]:
+    """
+    Parses a comma-separated list of host:port
+    """
+    return [(host, int(port)) for [host, port] in
+            (server.split(":") for server in value.split(","))]
+
+
+def get_server_client(servers: List[Tuple[str, int]], jobs: int) -> 'AlpinoClient':
+    from corpus2alpino.annotators.alpino_client import AlpinoServerClient, AlpinoServerPool
+    if len(servers) == 1:
+        [(host, port)] = servers
+        return AlpinoServerClient(host, port, jobs)
+    return AlpinoServerPool(servers, jobs)
+
+
+def get_policies(options, long_client: Optional['AlpinoClient']) -> List['LengthPolicy']:
+    if options.long_threshold == None:
+        return []
+    from corpus2alpino.annotators.alpino import LengthPolicy
+    return [LengthPolicy(options.long_threshold, long_client, options.long_timeout)]
+
+
+def get_collector(file_names: List[str]) -> Collector:
+    archives = [ArchiveCollector.is_archive(file_name) for file_name in file_names]
+    if all(archives):
+        return ArchiveCollector(file_names)
+    if any(archives):
+        raise ValueError("Archives can't be combined with other files")
+    return FilesystemCollector(file_names)
+
 
 def main(args=None):
     """
@@ -29,10 +66,46 @@ def main(args=None):
 
         parser.add_argument(
             'file_names', metavar='FILE', type=str, nargs='+',
-            help='CHAT/TEI/FoLiA file(s)/TXT to parse')
+            help='CHAT/TEI/FoLiA file(s)/TXT to parse, or zip/tar archive(s) containing these')
         parser.add_argument(
             '-s', '--server', metavar='SERVER', type=str,
-            help='host:port of Alpino server')
+            help='host:port of Alpino server, multiple servers can be separated by commas')
+        parser.add_argument(
+            '-j', '--jobs', metavar='JOBS', type=int,
+            help='Number of utterances to parse at the same time (default: the number of servers, the number of CPUs for a subprocess)')
+        parser.add_argument(
+            '--timeout', metavar='TIMEOUT', type=float,
+            help='Maximum number of seconds to parse an utterance')
+        parser.add_argument(
+            '--fallback_server', metavar='FALLBACK_SERVER', type=str,
+            help='host:port of Alpino server(s) to use for utterances which could not be parsed within the timeout')
+        parser.add_argument(
+            '--fallback_arguments', metavar='FALLBACK_ARGUMENTS', type=str,
+            help='Additional Alpino arguments for reparsing utterances which could not be parsed within the timeout, when using a subprocess (e.g. --fallback_arguments="-veryfast")')
+        parser.add_argument(
+            '--fallback_jobs', metavar='FALLBACK_JOBS', type=int, default=1,
+            help='Number of Alpino processes to start for --fallback_arguments, in addition to -j (default: 1)')
+        parser.add_argument(
+            '--long_threshold', metavar='LONG_THRESHOLD', type=int,
+            help='Minimum number of tokens of an utterance to use the --long_* settings')
+        parser.add_argument(
+            '--long_timeout', metavar='LONG_TIMEOUT', type=float,
+            help='Maximum number of seconds to parse a long utterance')
+        parser.add_argument(
+            '--long_server', metavar='LONG_SERVER', type=str,
+            help='host:port of Alpino server(s) to use for long utterances')
+        parser.add_argument(
+            '--long_arguments', metavar='LONG_ARGUMENTS', type=str,
+            help='Additional Alpino arguments for parsing long utterances, when using a subprocess (e.g. --long_arguments="-veryfast")')
+        parser.add_argument(
+            '--long_jobs', metavar='LONG_JOBS', type=int, default=1,
+            help='Number of Alpino processes to start for --long_arguments, in addition to -j (default: 1)')
+        parser.add_argument(
+            '--cache', metavar='CACHE', type=str,
+            help='Path to a file for storing parses, these are reused when the same text is parsed again')
+        parser.add_argument(
+            '--cache_size', metavar='CACHE_SIZE', type=int, default=1024,
+            help='Maximum size of the parse cache in MB (default: 1024)')
         parser.add_argument(
             '-e', '--enrichment', metavar='ENRICHMENT', type=str,
             help='Path to a CSV-file to use for enriching Lassy nodes with additional attributes'
@@ -55,6 +128,22 @@ def main(args=None):
         parser.add_argument('-t', '--split_treebanks',
                             action='store_true',
                             help='Split treebanks to separate files')
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Only convert the files which changed since the previous conversion to the output path (requires -o and -t)')
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue an interrupted conversion to the output path, skipping the documents which have been written')
+        parser.add_argument(
+            '--tokenizer', metavar='TOKENIZER', type=str,
+            default='spacy', choices=['spacy', 'rules'],
+            help='Tokenizer to use for plain text: spacy (default) or rules (faster, for text which is mostly split into sentences already)')
+        parser.add_argument(
+            '--tokenizer_processes', metavar='TOKENIZER_PROCESSES', type=int,
+            default=1,
+            help='Number of processes to use for tokenizing plain text (default: 1)')
 
         # passthrough the subprocess arguments
         subprocess = None
@@ -65,42 +154,105 @@ def main(args=None):
                 break
 
         options = parser.parse_args(args)
+        if options.incremental and (options.output_path == None or not options.split_treebanks):
+            parser.error('--incremental requires an output path (-o) and separate files (-t)')
+        if options.resume and options.output_path == None:
+            parser.error('--resume requires an output path (-o)')
 
-        collector = FilesystemCollector(options.file_names)
+        collector = get_collector(options.file_names)
         converter = Converter(collector)
+        if options.tokenizer == 'rules':
+            from corpus2alpino.readers.auto import AutoReader
+            from corpus2alpino.readers.tokenizer import RuleTokenizer
+            converter.reader = AutoReader(RuleTokenizer())
+        elif options.tokenizer_processes > 1:
+            from corpus2alpino.readers.auto import AutoReader
+            from corpus2alpino.readers.tokenizer import Tokenizer
+            tokenizer = Tokenizer(n_process=options.tokenizer_processes)
+            converter.reader = AutoReader(tokenizer)
         if options.server != None or options.output_format == "lassy" or subprocess != None:
+            from corpus2alpino.annotators.alpino import AlpinoAnnotator
+            from corpus2alpino.annotators.alpino_client import AlpinoProcessPool
+            from corpus2alpino.annotators.parse_cache import ParseCache
+            from corpus2alpino.writers.lassy import LassyWriter
+            cache = ParseCache(options.cache, options.cache_size * 1024 ** 2) \
+                if options.cache != None and (options.server != None or subprocess != None) else None
+            fallback = None
+            long_client = None
             if options.server != None:
-                [host, port] = options.server.split(":")
-                converter.annotators.append(AlpinoAnnotator(host, int(port)))
+                servers = parse_servers(options.server)
+                # keep every server busy
+                jobs = options.jobs or len(servers)
+                if options.fallback_server != None:
+                    fallback = get_server_client(
+                        parse_servers(options.fallback_server), jobs)
+                if options.long_server != None:
+                    long_client = get_server_client(
+                        parse_servers(options.long_server), jobs)
+                policies = get_policies(options, long_client)
+                if len(servers) == 1:
+                    [(host, port)] = servers
+                    converter.annotators.append(
+                        AlpinoAnnotator(host, port, jobs, cache, options.timeout, fallback, policies))
+                else:
+                    converter.annotators.append(
+                        AlpinoAnnotator(servers, None, jobs, cache, options.timeout, fallback, policies))
             elif subprocess != None:
+                jobs = options.jobs or os.cpu_count() or 1
                 executable = subprocess[0]
-                arguments = [arg for arg in subprocess[1:]] \
-                    + subprocess[2:]
+                arguments = subprocess[1:]
+                # these processes are only started when needed, but each
+                # process loads the grammar: keep their number small
+                if options.fallback_arguments != None:
+                    fallback = AlpinoProcessPool(
+                        executable, arguments + shlex.split(options.fallback_arguments), options.fallback_jobs)
+                if options.long_arguments != None:
+                    long_client = AlpinoProcessPool(
+                        executable, arguments + shlex.split(options.long_arguments), options.long_jobs)
                 converter.annotators.append(
-                    AlpinoAnnotator(executable, arguments))
+                    AlpinoAnnotator(executable, arguments, jobs, cache, options.timeout, fallback,
+                                    get_policies(options, long_client)))
 
             converter.writer = LassyWriter(not options.split_treebanks)
 
         if options.enrichment != None:
+            from corpus2alpino.annotators.enrich_lassy import EnrichLassyAnnotator
             converter.annotators.append(EnrichLassyAnnotator(options.enrichment))
 
         if options.output_path != None:
+            from corpus2alpino.targets.filesystem import FilesystemTarget
             converter.target = FilesystemTarget(
                 options.output_path, not options.split_treebanks)
+            from corpus2alpino.journal import ConversionJournal, JOURNAL_FILENAME
+            # a conversion to a single file is recorded next to it
+            converter.journal = ConversionJournal(
+                os.path.join(options.output_path, JOURNAL_FILENAME)
+                if options.split_treebanks else options.output_path + '.journal',
+                options.resume)
+            if options.incremental:
+                from corpus2alpino.incremental import ConversionManifest, MANIFEST_FILENAME
+                converter.manifest = ConversionManifest(
+                    os.path.join(options.output_path, MANIFEST_FILENAME))
 
         show_progress = options.output_path != None or options.progress
 
         if show_progress:
-            with tqdm(converter.convert(), total=len(options.file_names), unit='file') as progress:
-                last = collector.position
+            from tqdm import tqdm
+            # the progress is measured in bytes: the files are scanned
+            # (for their sizes) when the conversion starts
+            with tqdm(unit='B', unit_scale=True, unit_divisor=1024) as progress:
                 for _ in converter.convert():
-                    progress.update(collector.position - last)
-                    last = collector.position
-                    progress.total = collector.total
+                    progress.total = collector.total_bytes
+                    progress.update(collector.position_bytes - progress.n)
+                progress.total = collector.total_bytes
+                progress.update(collector.position_bytes - progress.n)
         else:
             for _ in converter.convert():
                 pass
 
+        if options.tokenizer_processes > 1 and options.tokenizer != 'rules':
+            tokenizer.close()
+
     except Exception as exception:
         sys.stderr.write(repr(exception) + "\n")
         sys.stderr.write("for help use --help\n\n")
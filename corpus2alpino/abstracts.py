@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 from abc import ABC, abstractmethod
-from typing import Any, Iterable, Union
+from typing import Any, Iterable, List, Union
 from os import path
 from pathlib import Path
 
@@ -11,6 +11,12 @@ class Collector(ABC):
     """
     Collects files from some data source.
     """
+    # the number of files collected so far and the (expected) total
+    position = 0
+    total = 0
+    # the same in bytes, for showing the progress of files of different sizes
+    position_bytes = 0
+    total_bytes = 0
 
     @abstractmethod
     def read(self) -> Iterable[CollectedFile]:
@@ -35,17 +41,39 @@ class Reader(ABC):
 
         pass
 
+    def configuration(self) -> str:
+        """
+        Description of the settings which affect the output, for
+        determining whether converted files are still up to date.
+        """
+        return type(self).__name__
+
 
 class Annotator(ABC):
     @abstractmethod
     def annotate(self, document: Document) -> None:
         """
         Adds annotations to a document and utterances. For example
-        a syntactic parse.
+        a syntactic parse. The utterances can be annotated while they
+        are read: by replacing the utterances of the document with
+        a stream of the annotated utterances.
         """
 
         pass
 
+    def close(self) -> None:
+        """
+        Release resources (e.g. a running parser).
+        """
+        return
+
+    def configuration(self) -> str:
+        """
+        Description of the settings which affect the output, for
+        determining whether converted files are still up to date.
+        """
+        return type(self).__name__
+
 
 class Target(ABC):
     """
@@ -76,6 +104,13 @@ class Target(ABC):
     def close(self) -> None:
         return
 
+    def abort(self) -> None:
+        """
+        The conversion failed or was stopped: release the resources,
+        without completing anything which is incomplete.
+        """
+        return
+
     @abstractmethod
     def flush(self) -> Any:
         """
@@ -84,6 +119,27 @@ class Target(ABC):
         """
         return
 
+    def outputs(self) -> List[str]:
+        """
+        The paths of the files written since the last call (if the target
+        writes separate files).
+        """
+        return []
+
+    def checkpoint(self) -> Any:
+        """
+        State of the target after a document has been written, from
+        which writing can be resumed (see resume).
+        """
+        return None
+
+    def resume(self, checkpoint: Any) -> None:
+        """
+        Continue writing after a checkpoint of an interrupted conversion,
+        discarding anything written after it.
+        """
+        return
+
 
 class Writer(ABC):
     """
@@ -93,3 +149,10 @@ class Writer(ABC):
     @abstractmethod
     def write(self, document: Document, target: Target) -> None:
         pass
+
+    def configuration(self) -> str:
+        """
+        Description of the settings which affect the output, for
+        determining whether converted files are still up to date.
+        """
+        return type(self).__name__
@@ -3,19 +3,28 @@
 Wrapper for the Alpino parser.
 """
 
-from .alpino_client import AlpinoProcessClient, AlpinoServerClient
-from corpus2alpino.models import Document, MetadataValue
+from .alpino_client import AlpinoClient, AlpinoProcessClient, AlpinoProcessPool, AlpinoServerClient, AlpinoServerPool, AlpinoTimeout, sentence_id_matcher
+from .parse_cache import ParseCache
+from corpus2alpino.models import Document, MetadataValue, Utterance
 from corpus2alpino.abstracts import Annotator
 import re
 import os
 import logging
 
-from typing import cast, Union, List
+from xml.sax.saxutils import escape
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import cast, Callable, Dict, Iterable, Union, List, Optional, Tuple
 
 ANNOTATION_KEY = 'alpino'
 
 
 timealign_symbol = re.compile(r'\u0015')
+whitespace = re.compile(r'\s+')
+
+# the parse and the client which made it
+ParseResult = Tuple[str, AlpinoClient]
 
 
 class AlpinoAnnotator(Annotator):
@@ -24,34 +33,265 @@ class AlpinoAnnotator(Annotator):
     Wrapper for annotating using Alpino (server or local).
     """
 
-    def __init__(self, host_or_path: str, port_or_args: Union[int, List[str]]):
+    def __init__(self,
+                 host_or_path: Union[str, List[Tuple[str, int]]],
+                 port_or_args: Union[int, List[str], None] = None,
+                 concurrency: int = 1,
+                 cache: Optional[ParseCache] = None,
+                 timeout: Optional[float] = None,
+                 fallback: Optional[AlpinoClient] = None,
+                 policies: Optional[List['LengthPolicy']] = None):
+        """
+        Arguments:
+            host_or_path {Union[str, List[Tuple[str, int]]]} -- Host name of an Alpino server,
+            the path to Alpino or a list of (host, port) of Alpino servers to distribute the
+            utterances over
+            port_or_args {Union[int, List[str], None]} -- Port of the server or the arguments
+            to pass to the Alpino process
+            concurrency {int} -- Number of utterances to parse at the same time,
+            when using a local Alpino this is the number of processes to start
+            cache {Optional[ParseCache]} -- Cache to retrieve and store parses
+            timeout {Optional[float]} -- Maximum number of seconds to parse an utterance,
+            utterances which take longer are marked using the alpino_timeout metadata
+            fallback {Optional[AlpinoClient]} -- Parser to use for utterances which
+            could not be parsed within the timeout, e.g. another server or a faster
+            configuration
+            policies {Optional[List[LengthPolicy]]} -- Settings to use for long utterances,
+            the settings used are stored in the alpino_settings metadata
+        """
+        self.concurrency = concurrency
+        self.cache = cache
+        self.timeout = timeout
+        self.fallback = fallback
+        self.policies = sorted(policies or [],
+                               key=lambda policy: policy.min_tokens,
+                               reverse=True)
         self.client = self.get_client(host_or_path, port_or_args)
+        # started when utterances are parsed
+        self.executor = cast(Optional[ThreadPoolExecutor], None)
+        # number of utterances to schedule at once
+        self.batch_size = concurrency * 16
 
-    def get_client(self, host_or_path: str, port_or_args: Union[int, List[str]]) -> Union[AlpinoProcessClient, AlpinoServerClient]:
-        if os.path.isfile(host_or_path) or os.path.isdir(host_or_path):
+    def get_client(self,
+                   host_or_path: Union[str, List[Tuple[str, int]]],
+                   port_or_args: Union[int, List[str], None]) -> AlpinoClient:
+        if isinstance(host_or_path, list):
+            return AlpinoServerPool(host_or_path, self.concurrency)
+        elif os.path.isfile(host_or_path) or os.path.isdir(host_or_path):
+            if self.concurrency > 1:
+                return AlpinoProcessPool(
+                    host_or_path, cast(List[str], port_or_args), self.concurrency)
             return AlpinoProcessClient(
                 host_or_path, cast(List[str], port_or_args))
         else:
             return AlpinoServerClient(
-                host_or_path, cast(int, port_or_args))
+                host_or_path, cast(int, port_or_args), self.concurrency)
 
     def annotate(self, document: Document):
-        for utterance in document.utterances:
+        document.utterances = self.annotate_utterances(
+            document, document.utterances)
+
+    def annotate_utterances(self, document: Document, utterances: Iterable[Utterance]) -> Iterable[Utterance]:
+        """
+        Parses the utterances while they are read. The parses of the next
+        batch of utterances are started before the current batch is
+        returned, so the parsers are kept busy.
+        """
+        pending = None
+        for batch in self.__batches(utterances):
+            scheduled = (batch, self.__schedule(
+                [utterance for utterance in batch if not ANNOTATION_KEY in utterance.annotations]))
+            if pending:
+                yield from self.__complete(document, *pending)
+            pending = scheduled
+
+        if pending:
+            yield from self.__complete(document, *pending)
+
+    def __batches(self, utterances: Iterable[Utterance]) -> Iterable[List[Utterance]]:
+        iterator = iter(utterances)
+        while True:
+            batch = list(islice(iterator, self.batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def __complete(self, document: Document, batch: List[Utterance], parses: List[Callable[[], ParseResult]]) -> Iterable[Utterance]:
+        parsed = iter(parses)
+        for utterance in batch:
+            if ANNOTATION_KEY in utterance.annotations:
+                yield utterance
+                continue
+
+            parse = next(parsed)
             try:
-                if not ANNOTATION_KEY in utterance.annotations:
-                    # replace the symbol with a middot to prevent XML parsing errors
-                    utterance.annotations[ANNOTATION_KEY] = timealign_symbol.sub(
-                        "·",
-                        self.client.parse_line(utterance.text, utterance.id))
-                    if self.client.version:
-                        utterance.metadata['alpino_version'] = MetadataValue(
-                            self.client.version)
-                    if self.client.version_date:
-                        utterance.metadata['alpino_version_date'] = MetadataValue(
-                            self.client.version_date.isoformat(), 'date')
+                xml, client = parse()
+                # replace the symbol with a middot to prevent XML parsing errors
+                utterance.annotations[ANNOTATION_KEY] = timealign_symbol.sub(
+                    "·", xml)
+                if client.version:
+                    utterance.metadata['alpino_version'] = MetadataValue(
+                        client.version)
+                if client.version_date:
+                    utterance.metadata['alpino_version_date'] = MetadataValue(
+                        client.version_date.isoformat(), 'date')
+                # e.g. a local Alpino started without additional arguments
+                # has no settings to record
+                if (self.policies or self.fallback) and client.settings:
+                    utterance.metadata['alpino_settings'] = MetadataValue(
+                        client.settings)
+            except AlpinoTimeout as exception:
+                _, timeout = self.__select(utterance)
+                utterance.metadata['alpino_timeout'] = MetadataValue(
+                    str(timeout), 'float')
+                logging.getLogger().warning(
+                    "Parsing timed out: {0}:{1}|{2}\n{3}".format(self.__document_path(document), utterance.id, utterance.text, exception))
             except Exception as exception:
                 logging.getLogger().error(
                     Exception("Problem parsing: {0}:{1}|{2}\n{3}".format(self.__document_path(document), utterance.id, utterance.text, exception)))
+            yield utterance
+
+        if self.cache:
+            self.cache.commit()
+
+    def __schedule(self, utterances: List[Utterance]) -> List[Callable[[], ParseResult]]:
+        """
+        Starts parsing the utterances and returns a function for each
+        utterance to retrieve its parse. Parses are retrieved from the
+        cache where possible and utterances with the same text are only
+        parsed once.
+        """
+        parses = cast(List[Callable[[], ParseResult]], [])
+        requested = cast(Dict[str, Callable[[], ParseResult]], {})
+        requests = cast(List[ParseRequest], [])
+
+        for utterance in utterances:
+            text = whitespace.sub(' ', utterance.text).strip()
+            if text in requested:
+                parses.append(self.__reuse(requested[text], utterance.id))
+                continue
+
+            cached = self.__lookup(utterance)
+            if cached is not None:
+                parse = self.__reuse(self.__cached(cached), utterance.id)
+            else:
+                request = ParseRequest(
+                    partial(self.__parse_line, utterance),
+                    parse_cost(utterance.text))
+                requests.append(request)
+                parse = self.__store(request, utterance)
+            requested[text] = parse
+            parses.append(parse)
+
+        if self.concurrency > 1:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(self.concurrency)
+            # start with the longest utterances: otherwise these could be
+            # left running at the end while the other workers are idle
+            for request in sorted(requests, key=lambda request: request.cost, reverse=True):
+                request.start(self.executor)
+
+        return parses
+
+    def __lookup(self, utterance: Utterance) -> Optional[ParseResult]:
+        if not self.cache:
+            return None
+
+        selected, _ = self.__select(utterance)
+        for client in [selected, self.fallback]:
+            if client:
+                xml = self.cache.get(self.__cache_key(utterance, client))
+                if xml is not None:
+                    return xml, client
+        return None
+
+    def __store(self, request: 'ParseRequest', utterance: Utterance) -> Callable[[], ParseResult]:
+        stored = cast(List[ParseResult], [])
+
+        def parse():
+            # also called for the utterances with the same text
+            if not stored:
+                xml, client = request.result()
+                if self.cache:
+                    self.cache.put(self.__cache_key(utterance, client), xml)
+                stored.append((xml, client))
+            return stored[0]
+
+        return parse
+
+    def __parse_line(self, utterance: Utterance) -> ParseResult:
+        client, timeout = self.__select(utterance)
+        try:
+            return client.parse_line(utterance.text, utterance.id, timeout), client
+        except AlpinoTimeout:
+            if not self.fallback:
+                raise
+            return self.fallback.parse_line(utterance.text, utterance.id, timeout), self.fallback
+
+    def __select(self, utterance: Utterance) -> Tuple[AlpinoClient, Optional[float]]:
+        """
+        Determines the client and timeout to use for parsing an utterance.
+        """
+        tokens = len(utterance.text.split())
+        for policy in self.policies:
+            if tokens >= policy.min_tokens:
+                return policy.client or self.client, \
+                    self.timeout if policy.timeout is None else policy.timeout
+        return self.client, self.timeout
+
+    def __cached(self, parsed: ParseResult) -> Callable[[], ParseResult]:
+        return lambda: parsed
+
+    def __reuse(self, parse: Callable[[], ParseResult], sentence_id: str) -> Callable[[], ParseResult]:
+        """
+        Use the parse of another utterance with the same text.
+        """
+        def reuse():
+            xml, client = parse()
+            return sentence_id_matcher.sub(
+                escape(sentence_id, {'"': '&quot;'}), xml, 1), client
+
+        return reuse
+
+    def close(self):
+        # everything is started again when annotating another document
+        if self.executor:
+            self.executor.shutdown()
+            self.executor = None
+        self.client.close()
+        if self.fallback:
+            self.fallback.close()
+        for policy in self.policies:
+            if policy.client:
+                policy.client.close()
+        if self.cache:
+            self.cache.close()
+
+    def configuration(self) -> str:
+        clients = [('parser', self.client)]
+        if self.fallback:
+            clients.append(('fallback', self.fallback))
+        for policy in self.policies:
+            if policy.client:
+                clients.append(('{0}+'.format(policy.min_tokens), policy.client))
+        # the hosts and ports of servers don't affect the output: these
+        # can change without converting everything again
+        parsers = ' '.join('{0}=[{1} {2} {3}]'.format(
+            name, client.version, client.version_date, client.configuration)
+            for (name, client) in clients)
+        policies = ','.join('{0}:{1}'.format(policy.min_tokens, policy.timeout)
+                            for policy in self.policies)
+        return 'AlpinoAnnotator {0} timeout={1} policies={2}'.format(
+            parsers, self.timeout, policies)
+
+    def __cache_key(self, utterance: Utterance, client: AlpinoClient) -> str:
+        configuration = client.configuration
+        if client is not self.client:
+            # the configuration of a server is unknown: prevent mixing
+            # the parses of different servers
+            configuration += ' ({0})'.format(client.settings)
+        return cast(ParseCache, self.cache).key(
+            utterance.text, client.version, configuration)
 
     def __document_path(self, document: Document):
         value = document.collected_file.filename
@@ -63,3 +303,59 @@ class AlpinoAnnotator(Annotator):
             value += '//' + document.subpath
 
         return value
+
+
+class LengthPolicy:
+    """
+    Settings to use for parsing utterances with a minimum number of tokens.
+    """
+
+    def __init__(self,
+                 min_tokens: int,
+                 client: Optional[AlpinoClient] = None,
+                 timeout: Optional[float] = None):
+        """
+        Arguments:
+            min_tokens {int} -- Minimum number of tokens of the utterances to
+            which this policy applies
+            client {Optional[AlpinoClient]} -- Parser to use for these utterances
+            e.g. Alpino with -veryfast, the annotator's parser is used otherwise
+            timeout {Optional[float]} -- Maximum number of seconds to parse
+            an utterance, the annotator's timeout is used otherwise
+        """
+        self.min_tokens = min_tokens
+        self.client = client
+        self.timeout = timeout
+
+
+class ParseRequest:
+    """
+    Parse which is started in the background (or when its result is
+    first requested). The line is only parsed once, also when its result
+    (or exception) is requested multiple times.
+    """
+
+    def __init__(self, parse_line: Callable[[], ParseResult], cost: int):
+        self.parse_line = parse_line
+        self.cost = cost
+        self.future = cast(Optional[Future], None)
+
+    def start(self, executor: ThreadPoolExecutor):
+        self.future = executor.submit(self.parse_line)
+
+    def result(self) -> ParseResult:
+        if self.future is None:
+            self.future = Future()
+            try:
+                self.future.set_result(self.parse_line())
+            except Exception as exception:
+                self.future.set_exception(exception)
+        return self.future.result()
+
+
+def parse_cost(text: str) -> int:
+    """
+    Estimates the relative time needed for parsing a text. The parse
+    time of Alpino grows steeply with the number of tokens.
+    """
+    return len(text.split()) ** 3
@@ -9,10 +9,14 @@ import os
 import errno
 import logging
 
-from subprocess import run, PIPE
+from abc import ABC, abstractmethod
+from subprocess import Popen, PIPE, TimeoutExpired
 from datetime import date
-from typing import List, Union, cast
-from tempfile import TemporaryDirectory
+from threading import BoundedSemaphore, Lock, Thread
+from queue import Empty, LifoQueue, Queue
+from time import monotonic
+from typing import IO, List, Optional, Tuple, Union, cast
+from xml.sax.saxutils import unescape
 
 from corpus2alpino.abstracts import Annotator
 from corpus2alpino.models import Document, MetadataValue
@@ -21,6 +25,16 @@ closing_punctuation = re.compile(r'([^\s])([\.?!])$')
 sentence_id_matcher = re.compile(r'(?<=sentid=")[^"]+(?=")')
 sentence_tag_matcher = re.compile(r'(?<=<sentence)(?![\w-])')
 
+# number of seconds to wait for the parse of a local Alpino process when
+# no timeout is given: Alpino doesn't output anything for some input
+READ_TIMEOUT = 600
+# number of seconds to wait for connecting to an Alpino server, this
+# doesn't count for the timeout of the sentence
+CONNECT_TIMEOUT = 10
+# parsed after starting Alpino, to know when it is ready
+WARM_UP_ID = 'warm-up'
+WARM_UP_SENTENCE = 'start'
+
 
 def determine_alpino_version(alpino_directory: Union[str, None]):
     try:
@@ -36,15 +50,95 @@ def determine_alpino_version(alpino_directory: Union[str, None]):
     return (version, version_date)
 
 
-class AlpinoServerClient:
+class AlpinoTimeout(Exception):
+    """
+    Parsing a sentence took longer than allowed.
+    """
+    pass
+
+
+class AlpinoClient(ABC):
+    """
+    Parses sentences using Alpino.
+    """
+
+    version = cast(Optional[str], None)
+    version_date = cast(Optional[date], None)
+    # parser settings which affect the output
+    configuration = ''
+
+    @abstractmethod
+    def parse_line(self, line: str, sentence_id: str, timeout: Optional[float] = None) -> str:
+        """Parse a line using the Alpino parser.
+
+
+        Arguments:
+            line {str} -- Tokenized text
+            sentence_id {str} -- Id to record in the XML output
+            timeout {Optional[float]} -- Maximum number of seconds to wait for the parse
+
+        Raises:
+            AlpinoTimeout: the parse took longer than the timeout
+
+        Returns:
+            {str} -- Lassy XML
+        """
+
+        pass
+
+    @property
+    def settings(self) -> str:
+        """
+        Description of the parser settings, for recording in the metadata.
+        """
+        return self.configuration
+
+    def close(self) -> None:
+        return
+
+
+class AlpinoServerClient(AlpinoClient):
     """
     Wrapper for connecting to an Alpino parser server.
     """
 
-    def __init__(self, host: str, port: int):
+    def __init__(self, host: str, port: int, max_connections: int = 1, check: bool = True):
+        """Connects to the parser server
+
+        Arguments:
+            host {str} -- Host name of the server
+            port {int} -- Port number of the server
+            max_connections {int} -- Maximum number of sentences which
+            can be parsed at the same time. The server closes the
+            connection after each parse, so every request uses a
+            new connection.
+            check {bool} -- Immediately check the server using health_check()
+        """
         self.host = host
         self.port = port
+        self.connections = BoundedSemaphore(max_connections)
 
+        self.prefix_id = True
+        self.write_id = False
+
+        # detect version
+        try:
+            alpino_home = cast(Union[str, None], os.environ['ALPINO_HOME'])
+        except KeyError:
+            alpino_home = None
+        self.version, self.version_date = determine_alpino_version(alpino_home)
+
+        if check:
+            self.health_check()
+
+    def health_check(self) -> None:
+        """
+        Parses a test sentence to check that the server is available
+        and to detect how it handles sentence IDs.
+
+        Raises:
+            Exception: the server is unavailable or unsupported
+        """
         self.prefix_id = True
         self.write_id = False
         parsed = self.parse_line("hallo wereld !", '42')
@@ -64,43 +158,48 @@ class AlpinoServerClient:
                 raise Exception(
                     "Unexpected sentence id: {0} instead of 42".format(match.group(0)))
 
-        # detect version
-        try:
-            alpino_home = cast(Union[str, None], os.environ['ALPINO_HOME'])
-        except KeyError:
-            alpino_home = None
-        self.version, self.version_date = determine_alpino_version(alpino_home)
-
-    def parse_line(self, line: str, sentence_id: str) ->str:
-        """Parse a line using the Alpino parser.
-
-
-        Arguments:
-            line {str} -- Tokenized text
-            sentence_id {str} -- Id to record in the XML output
-
-        Returns:
-            {str} -- Lassy XML
-        """
+    @property
+    def settings(self) -> str:
+        return "{0}:{1}".format(self.host, self.port)
 
+    def parse_line(self, line: str, sentence_id: str, timeout: Optional[float] = None) -> str:
         # add a whitespace before the closing punctuation when it's missing
         line = closing_punctuation.sub(
             lambda m: m.group(1) + ' ' + m.group(2), line)
 
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect((self.host, self.port))
         if self.prefix_id:
             line = "{0}|{1}".format(sentence_id, line)
-        s.sendall((line + "\n\n").encode())
-        received = []
 
-        while True:
-            buffer = s.recv(8192)
-            if not buffer:
-                break
-            received.append(str(buffer, encoding='utf8'))
-
-        xml = "".join(received)
+        with self.connections:
+            try:
+                connection = socket.create_connection((self.host, self.port), CONNECT_TIMEOUT)
+            except OSError as error:
+                # the server is unavailable, this isn't a problem of the sentence
+                raise ConnectionError(
+                    "Cannot connect to {0}:{1}: {2}".format(self.host, self.port, error)) from error
+
+            deadline = None if timeout is None else monotonic() + timeout
+            with connection as s:
+                try:
+                    s.settimeout(timeout)
+                    s.sendall((line + "\n\n").encode())
+                    received = []
+
+                    while True:
+                        if deadline is not None:
+                            remaining = deadline - monotonic()
+                            if remaining <= 0:
+                                raise socket.timeout()
+                            s.settimeout(remaining)
+                        buffer = s.recv(8192)
+                        if not buffer:
+                            break
+                        received.append(buffer)
+                except socket.timeout:
+                    raise AlpinoTimeout(
+                        "No response from {0}:{1} within {2} seconds".format(self.host, self.port, timeout))
+
+        xml = str(b"".join(received), encoding='utf8')
 
         if "<alpino_ds" not in xml:
             raise Exception(xml)
@@ -113,17 +212,155 @@ class AlpinoServerClient:
         return xml
 
 
-class AlpinoProcessClient:
+class AlpinoServerPool(AlpinoClient):
+    """
+    Distributes the sentences over multiple Alpino servers. Each
+    sentence is sent to the server which is expected to be done the
+    soonest, based on the number of outstanding requests and the recent
+    parse time. Servers which cannot be reached are taken out of
+    rotation until they pass a health check again.
+    """
+
+    def __init__(self, servers: List[Tuple[str, int]], max_connections: int = 1, retry_interval: float = 30):
+        """Connects to the parser servers
+
+        Arguments:
+            servers {List[Tuple[str, int]]} -- Host names and port numbers of the servers
+            max_connections {int} -- Maximum number of sentences which can be
+            parsed at the same time by each server
+            retry_interval {float} -- Seconds to wait before checking an
+            unavailable server again
+
+        Raises:
+            Exception: none of the servers are available
+        """
+        self.retry_interval = retry_interval
+        self.lock = Lock()
+        self.servers = [PooledServer(AlpinoServerClient(host, port, max_connections, False))
+                        for (host, port) in servers]
+
+        for server in self.servers:
+            self.__check(server)
+            if not server.available:
+                logging.getLogger().warning(
+                    "Alpino server {0}:{1} is unavailable".format(server.client.host, server.client.port))
+
+        available = [server for server in self.servers if server.available]
+        if not available:
+            raise Exception("None of the Alpino servers are available")
+        self.version = available[0].client.version
+        self.version_date = available[0].client.version_date
+
+    @property
+    def settings(self) -> str:
+        return ",".join(server.client.settings for server in self.servers)
+
+    def parse_line(self, line: str, sentence_id: str, timeout: Optional[float] = None) -> str:
+        tried = cast(List[PooledServer], [])
+        while True:
+            server = self.__acquire(tried)
+            start = monotonic()
+            try:
+                xml = server.client.parse_line(line, sentence_id, timeout)
+            except AlpinoTimeout:
+                # the sentence is the problem, not the server
+                self.__release(server)
+                raise
+            except OSError as error:
+                # could not connect or the connection was lost: try another server
+                self.__release(server)
+                self.__mark_unavailable(server, error)
+                tried.append(server)
+                continue
+
+            self.__release(server, (monotonic() - start) / (len(line.split()) + 1))
+            return xml
+
+    def __acquire(self, tried: List['PooledServer']) -> 'PooledServer':
+        """
+        Determines the server to use and registers the request.
+        """
+        now = monotonic()
+        with self.lock:
+            recovering = [server for server in self.servers
+                          if not server.available and server.retry_at <= now]
+            for server in recovering:
+                # only one thread should check a server
+                server.retry_at = now + self.retry_interval
+
+        for server in recovering:
+            self.__check(server)
+
+        with self.lock:
+            candidates = [server for server in self.servers
+                          if server.available and server not in tried]
+            if not candidates:
+                raise Exception("None of the Alpino servers are available")
+            server = min(candidates,
+                         key=lambda server: ((server.outstanding + 1) * server.latency, server.outstanding))
+            server.outstanding += 1
+            return server
+
+    def __release(self, server: 'PooledServer', latency: Optional[float] = None):
+        with self.lock:
+            server.outstanding -= 1
+            if latency is not None:
+                # exponentially weighted moving average
+                server.latency = 0.8 * server.latency + 0.2 * latency
+
+    def __check(self, server: 'PooledServer'):
+        start = monotonic()
+        try:
+            server.client.health_check()
+        except Exception as error:
+            self.__mark_unavailable(server, error)
+            return
+
+        with self.lock:
+            if not server.available:
+                logging.getLogger().info(
+                    "Alpino server {0}:{1} is available".format(server.client.host, server.client.port))
+            server.available = True
+            server.latency = (monotonic() - start) / 4
+
+    def __mark_unavailable(self, server: 'PooledServer', error: Exception):
+        with self.lock:
+            if server.available:
+                logging.getLogger().warning(
+                    "Alpino server {0}:{1} is unavailable: {2}".format(server.client.host, server.client.port, error))
+            server.available = False
+            server.retry_at = monotonic() + self.retry_interval
+
+
+class PooledServer:
+    """
+    State of a server in an AlpinoServerPool.
+    """
+
+    def __init__(self, client: AlpinoServerClient):
+        self.client = client
+        self.available = False
+        self.outstanding = 0
+        # seconds per token
+        self.latency = 0.0
+        self.retry_at = 0.0
+
+
+class AlpinoProcessClient(AlpinoClient):
     """
-    Wrapper for parsing using Alpino by running it as a process
+    Wrapper for parsing using Alpino by running it as a process. The
+    process is kept alive and the sentences are streamed to it, the
+    resulting XML is read from its output.
     """
 
-    def __init__(self, path: str, arguments: List[str]):
+    def __init__(self, path: str, arguments: List[str], read_timeout: float = READ_TIMEOUT):
         """Initializes the parser
 
         Arguments:
             path {str} -- Path to the Alpino executable
             arguments {List{str}} -- Command line arguments to pass to the Alpino process
+            read_timeout {float} -- Maximum number of seconds to wait for a parse
+            when no timeout is given
         """
 
         if os.path.isfile(path):
@@ -147,33 +384,168 @@ class AlpinoProcessClient:
 
         self.path = path
         self.arguments = arguments
+        self.read_timeout = read_timeout
+        self.configuration = ' '.join(arguments)
         self.version, self.version_date = determine_alpino_version(
             alpino_directory)
 
-    def parse_line(self, line: str, sentence_id: str):
-        """Parse a line using the Alpino parser.
-
-
-        Arguments:
-            line {str} -- Tokenized text
-            sentence_id {str} -- Id to record in the XML output
+        self.process = cast(Optional[Popen], None)
+        self.output = cast(Queue, Queue())
+        self.lock = Lock()
+
+    def parse_line(self, line: str, sentence_id: str, timeout: Optional[float] = None) -> str:
+        with self.lock:
+            process = self.__start()
+            stdin = cast(IO[str], process.stdin)
+            stdin.write(f"{sentence_id}|{line}\n")
+            stdin.flush()
+
+            try:
+                return self.__read_xml(process, sentence_id, timeout or self.read_timeout)
+            except AlpinoTimeout:
+                # Alpino is still busy with this sentence: restart it
+                process.kill()
+                process.wait()
+                cast(IO[str], process.stdin).close()
+                self.process = None
+                raise
+
+    def close(self):
+        """
+        Stop the Alpino process.
+        """
+        with self.lock:
+            if self.process is None:
+                return
+            try:
+                cast(IO[str], self.process.stdin).close()
+                self.process.wait(timeout=5)
+            except (OSError, TimeoutExpired):
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+
+    def __start(self) -> Popen:
+        """
+        Returns the running Alpino process, (re)starting it if needed.
+        Loading the grammar takes a while so this is only done once, the
+        process is returned once it has parsed a first sentence.
+        """
 
-        Returns:
-            {str} -- Lassy XML
+        if self.process is not None and self.process.poll() is None:
+            return self.process
+
+        self.process = Popen([self.path, "-notk", "end_hook=xml_dump", "-parse"] + self.arguments,
+                             stdin=PIPE,
+                             stdout=PIPE,
+                             stderr=PIPE,
+                             encoding="utf8",
+                             bufsize=1)
+        # the output is read continuously: a full stderr pipe would
+        # otherwise block Alpino and reading stdout on a separate
+        # thread allows waiting for it with a timeout
+        self.output = Queue()
+        Thread(target=self.__read_stream,
+               args=(self.process.stdout, self.output),
+               daemon=True).start()
+        Thread(target=self.__log_stream,
+               args=(self.process.stderr,),
+               daemon=True).start()
+
+        # wait for the grammar to be loaded: this shouldn't count for
+        # the timeout of the first sentence
+        process = self.process
+        try:
+            stdin = cast(IO[str], process.stdin)
+            stdin.write(f"{WARM_UP_ID}|{WARM_UP_SENTENCE}\n")
+            stdin.flush()
+            self.__read_xml(process, WARM_UP_ID, self.read_timeout)
+        except Exception:
+            process.kill()
+            process.wait()
+            cast(IO[str], process.stdin).close()
+            self.process = None
+            raise
+        return process
+
+    def __read_xml(self, process: Popen, sentence_id: str, timeout: float) -> str:
+        """
+        Reads the XML of the parse of a sentence from the output of the
+        process. The output of other sentences (e.g. a parse which was
+        output twice) is skipped.
         """
 
-        with TemporaryDirectory() as tmp:
-            result = run([self.path, "-notk", "-end_hook=xml", "-flag", "treebank", tmp, "-parse"] + self.arguments,
-                         input=f"{sentence_id}|{line}\n",
-                         stdout=PIPE,
-                         stderr=PIPE,
-                         encoding="utf8")
+        deadline = monotonic() + timeout
+        lines = cast(List[str], [])
+        while True:
+            try:
+                output = self.output.get(timeout=max(deadline - monotonic(), 0))
+            except Empty:
+                raise AlpinoTimeout(
+                    "No parse from Alpino within {0} seconds".format(timeout))
+            if not output:
+                raise Exception(
+                    "Alpino stopped unexpectedly (exit code: {0})".format(process.poll()))
+            if not lines and "<?xml" not in output and "<alpino_ds" not in output:
+                # not part of the XML
+                logging.getLogger().warning(output.rstrip())
+                continue
+            lines.append(output)
+            if "</alpino_ds>" in output:
+                xml = "".join(lines)
+                match = sentence_id_matcher.search(xml)
+                if match is None or unescape(match.group(0), {'&quot;': '"'}) == sentence_id:
+                    return xml
+                logging.getLogger().warning(
+                    "Skipped parse of {0} while waiting for {1}".format(match.group(0), sentence_id))
+                lines = []
+
+    def __read_stream(self, stream, output: Queue):
+        with stream:
+            for line in stream:
+                output.put(line)
+        # end of stream
+        output.put(None)
+
+    def __log_stream(self, stream):
+        with stream:
+            for output in stream:
+                logging.getLogger().warning(output.rstrip())
+
+
+class AlpinoProcessPool(AlpinoClient):
+    """
+    Parses sentences using multiple Alpino processes running in parallel,
+    each sentence is passed to a process which is not busy.
+    """
+
+    def __init__(self, path: str, arguments: List[str], processes: int):
+        """Initializes the parsers
 
-            if result.stdout:
-                logging.getLogger().warning(result.stdout)
-            if result.stderr:
-                logging.getLogger().warning(result.stderr)
+        Arguments:
+            path {str} -- Path to the Alpino executable
+            arguments {List{str}} -- Command line arguments to pass to the Alpino processes
+            processes {int} -- Number of Alpino processes to run
+        """
+        self.workers = [AlpinoProcessClient(path, arguments)
+                        for _ in range(processes)]
+        # the processes are started when they are first used: prefer
+        # the process which was used last
+        self.idle = cast(LifoQueue, LifoQueue())
+        for worker in self.workers:
+            self.idle.put(worker)
+
+        self.version = self.workers[0].version
+        self.version_date = self.workers[0].version_date
+        self.configuration = self.workers[0].configuration
+
+    def parse_line(self, line: str, sentence_id: str, timeout: Optional[float] = None) -> str:
+        worker = self.idle.get()
+        try:
+            return worker.parse_line(line, sentence_id, timeout)
+        finally:
+            self.idle.put(worker)
 
-            with open(os.path.join(tmp, f"{sentence_id}.xml"), "r", encoding="utf-8") as f:
-                xml = f.read()
-                return xml
+    def close(self):
+        for worker in self.workers:
+            worker.close()
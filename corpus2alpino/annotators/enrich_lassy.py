@@ -2,11 +2,11 @@
 """
 Allows enriching nodes of a Lassy annotation using a dictionary
 """
-from typing import cast, Dict, List
+from typing import cast, Dict, Iterable, List, Optional, Tuple
 
 import csv
+import hashlib
 import logging
-from lxml import etree
 
 from corpus2alpino.abstracts import Annotator
 from corpus2alpino.annotators.alpino import ANNOTATION_KEY
@@ -40,10 +40,17 @@ class EnrichLassyAnnotator(Annotator):
             even if the attribute is not on the node.
             Only the properties in the first matching row are assigned to the node.
 
+            The rows are indexed on their (non-empty) matchers, so the time needed
+            for enriching a node does not depend on the number of rows.
+
         Raises:
             Exception: Exception is raised if it could not load or
             parse the enrichment file
         """
+        with open(enrichment_file, 'rb') as binary:
+            # changing the enrichments changes the output
+            self.digest = hashlib.sha256(binary.read()).hexdigest()
+
         with open(enrichment_file) as enrichment:
             dialect = csv.Sniffer().sniff(enrichment.read(1024))
             enrichment.seek(0)
@@ -63,38 +70,64 @@ class EnrichLassyAnnotator(Annotator):
             self.enrichments = cast(List[Enrichment], [])
 
             for row in reader:
-                for i, value in enumerate(row):
-                    # get the cell values for the matchers and the assignments using
-                    # dictionary comprehensions
-                    self.enrichments.append(Enrichment(
-                        {
-                            key: row[index] for key, index in matchers.items() if row[index]
-                        },
-                        {
-                            key: row[index] for key, index in assigners.items() if row[index]
-                        }))
+                # get the cell values for the matchers and the assignments using
+                # dictionary comprehensions
+                self.enrichments.append(Enrichment(
+                    {
+                        key: row[index] for key, index in matchers.items() if row[index]
+                    },
+                    {
+                        key: row[index] for key, index in assigners.items() if row[index]
+                    }))
+
+        # rows grouped by the attributes they match on,
+        # with a lookup from the matching values to the first row
+        self.index = cast(Dict[Tuple[str, ...], Dict[Tuple[str, ...], int]], {})
+        for position, rule in enumerate(self.enrichments):
+            keys = tuple(sorted(rule.matchers))
+            values = tuple(rule.matchers[key] for key in keys)
+            self.index.setdefault(keys, {}).setdefault(values, position)
+
+    def configuration(self) -> str:
+        return 'EnrichLassyAnnotator {0}'.format(self.digest)
 
     def annotate(self, document: Document):
-        for utterance in document.utterances:
+        document.utterances = self.annotate_utterances(document.utterances)
+
+    def annotate_utterances(self, utterances: Iterable[Utterance]) -> Iterable[Utterance]:
+        for utterance in utterances:
             if not ANNOTATION_KEY in utterance.annotations:
                 logging.getLogger().error(
                     Exception("Lassy annotation missing for: {0}|{1}".format(utterance.id, utterance.text)))
             else:
                 self.enrich_utterance(utterance)
+            yield utterance
 
     def enrich_utterance(self, utterance: Utterance):
-        annotation = utterance.annotations[ANNOTATION_KEY]
-        parse = etree.fromstring(annotation)
-        modified = False
+        # the nodes are enriched in place
+        parse = utterance.get_annotation_tree(ANNOTATION_KEY)
         for node in parse.iter("node"):
-            for enrichment in self.enrichments:
-                if enrichment.assign_match(node):
-                    modified = True
-                    break
-        if modified:
-            # store the updated lassy xml with the enriched nodes
-            utterance.annotations[ANNOTATION_KEY] = etree.tostring(
-                parse, encoding='utf8').decode('utf8')
+            enrichment = self.find_match(node)
+            if enrichment is not None:
+                enrichment.assign(node)
+
+    def find_match(self, node) -> Optional['Enrichment']:
+        """Find the first enrichment matching a node.
+
+        Arguments:
+            node {[type]} -- lxml Element of a Lassy node
+
+        Returns:
+            Optional[Enrichment] -- The first matching enrichment (if any)
+        """
+        attributes = node.attrib
+        first = None
+        for keys, rows in self.index.items():
+            position = rows.get(tuple(attributes.get(key) for key in keys))
+            if position is not None and (first is None or position < first):
+                first = position
+
+        return None if first is None else self.enrichments[first]
 
 
 class Enrichment:
@@ -102,21 +135,11 @@ class Enrichment:
         self.matchers = matchers
         self.assigners = assigners
 
-    def assign_match(self, node) -> bool:
-        """Check whether the Node lxml Element matches this enrichment.
-        If this is the case, the values are assigned to this node.
+    def assign(self, node) -> None:
+        """Assigns the values of this enrichment to a node.
 
         Arguments:
             node {[type]} -- lxml Element of a Lassy node
-
-        Returns:
-            bool -- Whether this node matched
         """
-        for key, value in self.matchers.items():
-            if node.attrib.get(key) != value:
-                return False
-
         for key, value in self.assigners.items():
             node.attrib[key] = value
-
-        return True
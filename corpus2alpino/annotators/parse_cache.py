@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Persistent cache for Alpino parses.
+"""
+
+import hashlib
+import re
+import sqlite3
+import zlib
+
+from threading import Lock
+from typing import cast, Optional
+
+whitespace = re.compile(r'\s+')
+
+
+class ParseCache:
+    """
+    Stores parses in a SQLite database, keyed on the (normalized) text of
+    the utterance and the parser configuration. When the cache exceeds its
+    maximum size, the least recently used parses are removed.
+    """
+
+    def __init__(self, path: str, max_size: int = 1024 ** 3):
+        """Opens (or creates) a parse cache
+
+        Arguments:
+            path {str} -- Path to the database file
+            max_size {int} -- Maximum size of the stored (compressed) parses in bytes
+        """
+        self.path = path
+        self.max_size = max_size
+        self.lock = Lock()
+        self.__connection = cast(Optional[sqlite3.Connection], None)
+        self.__connect()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """
+        Connection to the database, it is opened again after closing the cache.
+        """
+        if self.__connection is None:
+            self.__connect()
+        return cast(sqlite3.Connection, self.__connection)
+
+    def __connect(self) -> None:
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.__connection = connection
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS parses (
+                key TEXT PRIMARY KEY,
+                xml BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                used INTEGER NOT NULL)""")
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS parses_used ON parses (used)")
+        connection.commit()
+        # the order in which the parses were used
+        (self.size, self.clock) = connection.execute(
+            "SELECT COALESCE(SUM(size), 0), COALESCE(MAX(used), 0) FROM parses").fetchone()
+
+    def key(self, text: str, version: Optional[str], configuration: str) -> str:
+        """Determines the key of a parse
+
+        Arguments:
+            text {str} -- Text of the utterance
+            version {Optional[str]} -- Version of Alpino
+            configuration {str} -- Arguments passed to Alpino
+
+        Returns:
+            str -- Key to use for retrieving or storing the parse
+        """
+        normalized = whitespace.sub(' ', text).strip()
+        return hashlib.sha256(
+            '\n'.join([normalized, version or '', configuration]).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT xml FROM parses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self.clock += 1
+            self.connection.execute(
+                "UPDATE parses SET used = ? WHERE key = ?", (self.clock, key))
+            return zlib.decompress(row[0]).decode('utf8')
+
+    def put(self, key: str, xml: str) -> None:
+        compressed = zlib.compress(xml.encode('utf8'))
+        with self.lock:
+            previous = self.connection.execute(
+                "SELECT size FROM parses WHERE key = ?", (key,)).fetchone()
+            if previous:
+                self.size -= previous[0]
+            self.clock += 1
+            self.connection.execute(
+                "INSERT OR REPLACE INTO parses (key, xml, size, used) VALUES (?, ?, ?, ?)",
+                (key, compressed, len(compressed), self.clock))
+            self.size += len(compressed)
+            if self.size > self.max_size:
+                self.__evict()
+
+    def commit(self) -> None:
+        with self.lock:
+            self.connection.commit()
+
+    def close(self) -> None:
+        with self.lock:
+            if self.__connection is None:
+                return
+            self.__connection.commit()
+            self.__connection.close()
+            self.__connection = None
+
+    def __evict(self):
+        """
+        Removes the least recently used parses, until the cache is reduced
+        to 90% of its maximum size (to prevent evicting on every insert).
+        """
+        target = self.max_size * 0.9
+        evicted = []
+        for (key, size) in self.connection.execute(
+                "SELECT key, size FROM parses ORDER BY used"):
+            if self.size <= target:
+                break
+            evicted.append((key,))
+            self.size -= size
+        self.connection.executemany("DELETE FROM parses WHERE key = ?", evicted)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Collects the files in zip and tar archives, without extracting them.
+"""
+import logging
+import posixpath
+import time
+from functools import partial
+from io import BytesIO
+from os import path
+from typing import cast, BinaryIO, Callable, Iterable, List, Optional
+
+from corpus2alpino.abstracts import Collector
+from corpus2alpino.models import CollectedFile
+
+# compressed tar archives are recognized by their content
+tar_extensions = ['.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz']
+
+
+class ArchiveCollector(Collector):
+    """
+    Collects the members of zip and tar (.tar, .tar.gz, .tar.bz2 and
+    .tar.xz) archives. The path of a member within the archive is
+    used as its relative path: the same as when collecting the files
+    of the extracted archive. When multiple archives are collected,
+    this path starts with the name of the archive (without extension).
+    Members with a path outside of the archive are skipped.
+    """
+
+    def __init__(self, filepaths: List[str], encoding: str = 'utf-8') -> None:
+        self.filepaths = filepaths
+        self.encoding = encoding
+        self.total = len(filepaths)
+        if len(filepaths) > 1:
+            common = path.commonpath([path.dirname(path.abspath(filepath))
+                                      for filepath in filepaths])
+            self.prefixes = [self.archive_name(path.relpath(path.abspath(filepath), common))
+                             for filepath in filepaths]
+        else:
+            self.prefixes = ['']
+
+    @staticmethod
+    def is_archive(filepath: str) -> bool:
+        lower = filepath.lower()
+        return lower.endswith('.zip') or \
+            any(lower.endswith(extension) for extension in tar_extensions)
+
+    @staticmethod
+    def archive_name(filepath: str) -> str:
+        """
+        The path of the archive without its extension, using forward slashes.
+        """
+        lower = filepath.lower()
+        for extension in ['.zip'] + tar_extensions:
+            if lower.endswith(extension):
+                filepath = filepath[:-len(extension)]
+                break
+        return posixpath.join(*filepath.split(path.sep))
+
+    def read(self) -> Iterable[CollectedFile]:
+        self.position = 0
+        self.position_bytes = 0
+        self.total = len(self.filepaths)
+        self.total_bytes = 0
+        for (filepath, prefix) in zip(self.filepaths, self.prefixes):
+            if filepath.lower().endswith('.zip'):
+                yield from self.read_zip(filepath, prefix)
+            else:
+                yield from self.read_tar(filepath, prefix)
+
+    def read_zip(self, filepath: str, prefix: str = '') -> Iterable[CollectedFile]:
+        import zipfile
+        with zipfile.ZipFile(filepath) as archive:
+            members = [(member, self.member_path(filepath, member.filename))
+                       for member in archive.infolist() if not member.is_dir()]
+            members = [(member, name) for (member, name) in members if name is not None]
+            self.total += len(members) - 1
+            self.total_bytes += sum(member.file_size for (member, _) in members)
+            for (member, name) in members:
+                # members can be opened (and read) in any order
+                yield self.collect(filepath, prefix, cast(str, name), member.file_size,
+                                   time.mktime(member.date_time + (0, 0, -1)),
+                                   cast(Callable[[], BinaryIO], partial(archive.open, member)))
+                self.position += 1
+                self.position_bytes += member.file_size
+
+    def read_tar(self, filepath: str, prefix: str = '') -> Iterable[CollectedFile]:
+        import tarfile
+        # a compressed archive is read as a stream: seeking in it would
+        # decompress it again
+        with tarfile.open(filepath, 'r|*') as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                name = self.member_path(filepath, member.name)
+                if name is None:
+                    continue
+                # the number (and size) of the members isn't known in advance
+                self.total += 1
+                self.total_bytes += member.size
+                member_file = archive.extractfile(member)
+                # a member can only be read before moving to the next one,
+                # but it can be opened multiple times (e.g. to recognize it)
+                content = member_file.read() if member_file is not None else b''
+                yield self.collect(filepath, prefix, name, member.size, member.mtime,
+                                   cast(Callable[[], BinaryIO], partial(BytesIO, content)))
+                self.position += 1
+                self.position_bytes += member.size
+        # the archive itself was counted as a file
+        self.total -= 1
+
+    def member_path(self, filepath: str, name: str) -> Optional[str]:
+        """
+        The normalized path of a member, None if it would be outside of the
+        archive (e.g. ../file or /file): it would be written outside of the
+        output directory.
+        """
+        normalized = posixpath.normpath(name)
+        if posixpath.isabs(normalized) or normalized == '..' or normalized.startswith('../'):
+            logging.getLogger().warning(
+                "Skipped %s in %s: its path is outside of the archive", name, filepath)
+            return None
+        return normalized
+
+    def collect(self, filepath: str, prefix: str, name: str, size: int, mtime: float,
+                open: Callable[[], BinaryIO]) -> CollectedFile:
+        (relpath, filename) = posixpath.split(posixpath.join(prefix, name))
+        return CollectedFile(relpath, filename, '', open=open, encoding=self.encoding,
+                             size=size, mtime=mtime, source=filepath)
@@ -1,16 +1,32 @@
 #!/usr/bin/env python3
 import glob
-from typing import Iterable, List
-from pathlib import Path
-from os import listdir, path
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import cast, BinaryIO, Callable, Iterable, Iterator, List, NamedTuple, Tuple, Union
+from os import path
 
 from corpus2alpino.abstracts import Collector
 from corpus2alpino.models import CollectedFile
 
 
-class FilesystemCollector(Collector):
-    position = 0
+class ManifestEntry(NamedTuple):
+    """
+    A file found by scanning the file paths.
+    """
+    path: str
+    relpath: str
+    filename: str
+    size: int
+    mtime: float
+
+
+# the files (with their size and modification time) of a directory and
+# the scans of its subdirectories, in the order in which they were found
+DirectoryScan = List[Union[Tuple[str, int, float], 'Future[DirectoryScan]']]
 
+
+class FilesystemCollector(Collector):
     def __clear_pattern(self, filepath: str) -> str:
         realpath = filepath.split('*')[0]
         if path.isdir(realpath):
@@ -18,31 +34,83 @@ class FilesystemCollector(Collector):
         else:
             return path.split(realpath)[0]
 
-    def __init__(self, filepaths: List[str]) -> None:
+    def __init__(self, filepaths: List[str], encoding: str = 'utf-8', threads: int = 16) -> None:
+        """Collects files and the files in directories
+
+        Arguments:
+            filepaths {List[str]} -- Paths of the files and directories, these can be glob patterns
+            encoding {str} -- Encoding of the files
+            threads {int} -- Number of directories to scan at the same time
+        """
         # Only determine common directory up to the first pattern
         self.common = path.commonpath(list(
             self.__clear_pattern(filepath) for filepath in filepaths))
         self.filepaths = filepaths
+        self.encoding = encoding
+        self.threads = threads
         self.total = len(filepaths)
 
     def read(self) -> Iterable[CollectedFile]:
+        manifest = self.scan()
         self.position = 0
-        return self.yield_files(self.filepaths)
-
-    def yield_files(self, filepaths, encoding: str = 'utf-8'):
-        for filepath in filepaths:
-            globbed = glob.glob(filepath, recursive=True)
-            self.total += len(globbed) - 1
-
-            for match in globbed:
-                if path.isdir(match):
-                    yield from self.yield_files(
-                        path.join(match, file) for file in listdir(match))
-                    continue
-
-                (relpath, filename) = path.split(
-                    path.relpath(match, self.common))
-                # TODO: mime type?
-                with open(match, encoding=encoding) as file:
-                    yield CollectedFile(relpath, filename, '', file.read())
-                self.position += 1
+        self.position_bytes = 0
+        self.total = len(manifest)
+        self.total_bytes = sum(entry.size for entry in manifest)
+        return self.yield_files(manifest)
+
+    def yield_files(self, manifest: List[ManifestEntry]) -> Iterator[CollectedFile]:
+        for entry in manifest:
+            # TODO: mime type?
+            # the content is only read when the file is recognized
+            yield CollectedFile(entry.relpath, entry.filename, '',
+                                open=cast(Callable[[], BinaryIO], partial(open, entry.path, 'rb')),
+                                encoding=self.encoding,
+                                size=entry.size,
+                                mtime=entry.mtime,
+                                source=entry.path)
+            self.position += 1
+            self.position_bytes += entry.size
+
+    def scan(self) -> List[ManifestEntry]:
+        """
+        Finds all the files (and their sizes) before they are read. The
+        directories are scanned in parallel, which is much faster on
+        network file systems.
+
+        Returns:
+            List[ManifestEntry] -- The files in the order in which they are read
+        """
+        with ThreadPoolExecutor(self.threads) as executor:
+            manifest = cast(List[ManifestEntry], [])
+            for filepath in self.filepaths:
+                for match in glob.glob(filepath, recursive=True):
+                    if path.isdir(match):
+                        scan = executor.submit(self.scan_directory, executor, match)
+                        files = self.expand(scan)  # type: Iterable[Tuple[str, int, float]]
+                    else:
+                        stat = os.stat(match)
+                        files = [(match, stat.st_size, stat.st_mtime)]
+                    for (filename, size, mtime) in files:
+                        (relpath, name) = path.split(
+                            path.relpath(filename, self.common))
+                        manifest.append(ManifestEntry(filename, relpath, name, size, mtime))
+            return manifest
+
+    def scan_directory(self, executor: ThreadPoolExecutor, directory: str) -> DirectoryScan:
+        scan = cast(DirectoryScan, [])
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    scan.append(executor.submit(
+                        self.scan_directory, executor, entry.path))
+                else:
+                    stat = entry.stat()
+                    scan.append((entry.path, stat.st_size, stat.st_mtime))
+        return scan
+
+    def expand(self, scan: 'Future[DirectoryScan]') -> Iterator[Tuple[str, int, float]]:
+        for item in scan.result():
+            if isinstance(item, Future):
+                yield from self.expand(item)
+            else:
+                yield item
@@ -1,11 +1,9 @@
 #!/usr/bin/env python3
-from typing import List, Optional
-
-from corpus2alpino.readers.auto import AutoReader
-from corpus2alpino.targets.console import ConsoleTarget
-from corpus2alpino.writers.paqu import PaQuWriter
+from typing import cast, List, Optional
 
 from corpus2alpino.abstracts import Annotator, Collector, Reader, Target, Writer
+from corpus2alpino.incremental import ConversionManifest
+from corpus2alpino.journal import ConversionJournal
 
 
 class Converter:
@@ -17,21 +15,99 @@ class Converter:
         self,
         collector: Collector,
         annotators: Optional[List[Annotator]] = None,
-        reader: Reader = AutoReader(),
-        writer: Writer = PaQuWriter(),
-        target: Target = ConsoleTarget(),
+        reader: Optional[Reader] = None,
+        writer: Optional[Writer] = None,
+        target: Optional[Target] = None,
+        manifest: Optional[ConversionManifest] = None,
+        journal: Optional[ConversionJournal] = None,
     ) -> None:
+        """Converts collected files
+
+        Arguments:
+            collector {Collector} -- Collects the files to convert
+            annotators {Optional[List[Annotator]]} -- Annotators to apply (e.g. Alpino)
+            reader {Optional[Reader]} -- Reader to use, default: detect the format (AutoReader)
+            writer {Optional[Writer]} -- Writer to use, default: PaQu metadata format
+            target {Optional[Target]} -- Target to write to, default: the console
+            manifest {Optional[ConversionManifest]} -- Manifest of a previous conversion,
+            only the files which changed since (or were added) are converted
+            journal {Optional[ConversionJournal]} -- Journal for recording the written documents,
+            when resuming the documents recorded in it are skipped
+        """
         self.collector = collector
         self.annotators = annotators or []
+        if reader is None:
+            from corpus2alpino.readers.auto import AutoReader
+            reader = AutoReader()
+        if writer is None:
+            from corpus2alpino.writers.paqu import PaQuWriter
+            writer = PaQuWriter()
+        if target is None:
+            from corpus2alpino.targets.console import ConsoleTarget
+            target = ConsoleTarget()
         self.reader = reader
         self.writer = writer
         self.target = target
+        self.manifest = manifest
+        self.journal = journal
+
+    def configuration(self) -> str:
+        """
+        Description of the settings which affect the output.
+        """
+        return '\n'.join([self.reader.configuration()] +
+                         [annotator.configuration() for annotator in self.annotators] +
+                         [self.writer.configuration()])
 
     def convert(self):
-        for file in self.collector.read():
-            for document in self.reader.read(file):
-                for annotator in self.annotators:
-                    annotator.annotate(document)
-                self.writer.write(document, self.target)
-                yield self.target.flush()
-        self.target.close()
+        configuration = self.configuration()
+        if self.manifest:
+            self.manifest.start(configuration)
+        if self.journal:
+            self.target.resume(self.journal.start(configuration))
+        complete = False
+        try:
+            for file in self.collector.read():
+                if self.manifest:
+                    if self.manifest.unchanged(file):
+                        continue
+                    # keep the documents written before the conversion was interrupted
+                    if not (self.journal and self.journal.started(file)):
+                        self.manifest.remove(file)
+                outputs = cast(List[str], [])
+                for index, document in enumerate(self.reader.read(file)):
+                    if self.journal and self.journal.completed(file, index):
+                        outputs += self.journal.outputs(file, index)
+                        continue
+                    for annotator in self.annotators:
+                        annotator.annotate(document)
+                    self.writer.write(document, self.target)
+                    result = self.target.flush()
+                    written = self.target.outputs()
+                    outputs += written
+                    # recorded before yielding: the conversion can be
+                    # stopped while the result is handled
+                    if self.journal:
+                        self.journal.record(file, index, written, self.target.checkpoint())
+                    yield result
+                if self.manifest:
+                    self.manifest.add(file, outputs)
+            complete = True
+        finally:
+            # also when the conversion failed or was stopped: the
+            # annotators can be used again for another conversion
+            for annotator in self.annotators:
+                annotator.close()
+            if complete:
+                self.target.close()
+                if self.manifest:
+                    self.manifest.finish()
+                if self.journal:
+                    self.journal.finish()
+            else:
+                # keep what has been converted, so it can be resumed
+                self.target.abort()
+                if self.manifest:
+                    self.manifest.save()
+                if self.journal:
+                    self.journal.close()
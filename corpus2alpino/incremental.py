@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Keeps track of the files which have been converted, so a conversion can
+be repeated for only the files which were added or changed since.
+"""
+import hashlib
+import json
+import os
+from time import monotonic
+from typing import cast, Any, Dict, List, Set
+
+from corpus2alpino.models import CollectedFile
+
+# name of the manifest in the output directory
+MANIFEST_FILENAME = '.corpus2alpino.json'
+# number of bytes to read at once for determining the hash of a file
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_key(file: CollectedFile) -> str:
+    """
+    Identifies a collected file, independent of the operating system.
+    """
+    return '/'.join(part for part in file.relpath.split(os.sep) + [file.filename] if part)
+
+
+def hash_file(file: CollectedFile) -> str:
+    digest = hashlib.sha256()
+    with file.stream() as stream:
+        while True:
+            block = stream.read(HASH_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ConversionManifest:
+    """
+    Records the size, modification time and hash of each converted file,
+    the configuration used to convert it and the files written for it.
+    A file is only converted again if it changed or if the configuration
+    (e.g. the reader, annotators, Alpino version or writer) changed.
+    """
+
+    def __init__(self, path: str, save_interval: float = 60) -> None:
+        """
+        Arguments:
+            path {str} -- Path of the manifest, it is created if it doesn't exist
+            save_interval {float} -- Number of seconds after which the manifest
+            is saved while converting, so an interrupted conversion doesn't have
+            to start over
+        """
+        self.path = path
+        self.save_interval = save_interval
+        self.configuration = ''
+        self.digest = ''
+        try:
+            with open(path, encoding='utf-8') as manifest:
+                self.files = cast(Dict[str, Dict[str, Any]],
+                                  json.load(manifest)['files'])
+        except FileNotFoundError:
+            self.files = {}
+        # the files found during this conversion
+        self.seen = cast(Set[str], set())
+        self.saved = monotonic()
+
+    def start(self, configuration: str) -> None:
+        """
+        Starts a conversion using a configuration (see Converter.configuration).
+        """
+        self.configuration = configuration
+        self.digest = hashlib.sha256(configuration.encode('utf-8')).hexdigest()
+        self.seen = set()
+
+    def unchanged(self, file: CollectedFile) -> bool:
+        """
+        Whether the file has been converted using the same configuration
+        and hasn't changed since. Touching a file (e.g. by copying it)
+        doesn't make it change, as long as its content is the same.
+        """
+        key = file_key(file)
+        self.seen.add(key)
+        entry = self.files.get(key)
+        if entry is None or \
+                entry['configuration'] != self.digest or \
+                entry['size'] != file.size or \
+                not all(os.path.exists(output) for output in entry['outputs']):
+            return False
+        if entry['mtime'] != file.mtime:
+            if entry['hash'] != hash_file(file):
+                return False
+            entry['mtime'] = file.mtime
+        return True
+
+    def remove(self, file: CollectedFile) -> None:
+        """
+        Removes the files written for the previous conversion of a file.
+        """
+        self.__remove(file_key(file))
+
+    def add(self, file: CollectedFile, outputs: List[str]) -> None:
+        """
+        Records the conversion of a file.
+
+        Arguments:
+            file {CollectedFile} -- The converted file
+            outputs {List[str]} -- The paths of the files written for it
+        """
+        self.files[file_key(file)] = {
+            'size': file.size,
+            'mtime': file.mtime,
+            'hash': hash_file(file),
+            'configuration': self.digest,
+            'outputs': [os.path.abspath(output) for output in outputs],
+            'source': os.path.abspath(file.source) if file.source else None
+        }
+        if monotonic() - self.saved >= self.save_interval:
+            self.save()
+
+    def finish(self) -> None:
+        """
+        Completes the conversion: the files written for files which
+        no longer exist are removed. Files which weren't part of this
+        conversion (e.g. when converting some of the files) are kept.
+        """
+        for key in list(self.files):
+            if key not in self.seen:
+                source = self.files[key].get('source')
+                if source is not None and not os.path.exists(source):
+                    self.__remove(key)
+        self.save()
+
+    def save(self) -> None:
+        # replace the manifest at once: it should never be incomplete
+        temporary = self.path + '.tmp'
+        directory = os.path.dirname(self.path)
+        if directory != '':
+            os.makedirs(directory, exist_ok=True)
+        with open(temporary, 'w', encoding='utf-8') as manifest:
+            json.dump({
+                'configuration': self.configuration,
+                'files': self.files
+            }, manifest, indent=1)
+        os.replace(temporary, self.path)
+        self.saved = monotonic()
+
+    def __remove(self, key: str) -> None:
+        entry = self.files.pop(key, None)
+        if entry is None:
+            return
+        for output in entry['outputs']:
+            try:
+                os.remove(output)
+            except FileNotFoundError:
+                pass
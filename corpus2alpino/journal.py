@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Journal of the documents which have been converted, so an interrupted
+conversion can be resumed where it stopped.
+"""
+import hashlib
+import json
+import os
+from typing import cast, Any, Dict, List, Optional, TextIO
+
+from corpus2alpino.incremental import file_key
+from corpus2alpino.models import CollectedFile
+
+JOURNAL_FILENAME = '.corpus2alpino.journal'
+
+
+class ConversionJournal:
+    """
+    Append-only record of the documents which have been written. Each line
+    is a JSON object: the first contains a digest of the configuration,
+    the others identify a document (by its file and its position in the
+    file), the files written for it and the state of the target after
+    writing it. The journal is removed once the conversion is complete.
+    """
+
+    def __init__(self, path: str, resume: bool = False) -> None:
+        """
+        Arguments:
+            path {str} -- Path of the journal
+            resume {bool} -- Continue the conversion recorded in the journal
+            (if it exists), otherwise the journal is started over
+        """
+        self.path = path
+        self.resume = resume
+        # the files written for each completed document of each file
+        self.documents = cast(Dict[str, Dict[int, List[str]]], {})
+        self.file = cast(Optional[TextIO], None)
+
+    def start(self, configuration: str) -> Any:
+        """Starts (or resumes) the conversion
+
+        Arguments:
+            configuration {str} -- Settings which affect the output (see Converter.configuration)
+
+        Raises:
+            ValueError: the conversion to resume used another configuration
+
+        Returns:
+            Any -- The state of the target to resume from, None when starting over
+        """
+        digest = hashlib.sha256(configuration.encode('utf-8')).hexdigest()
+        records = self.__read() if self.resume else []
+        checkpoint = None
+        if records:
+            if records[0].get('configuration') != digest:
+                raise ValueError(
+                    "Can't resume a conversion using other settings: " + self.path)
+            for record in records[1:]:
+                self.documents.setdefault(record['file'], {})[record['document']] = record['outputs']
+                checkpoint = record['checkpoint']
+        else:
+            records = [{'configuration': digest}]
+
+        # a record can be incomplete if the conversion was interrupted
+        # while writing it: only keep the complete records
+        temporary = self.path + '.tmp'
+        directory = os.path.dirname(self.path)
+        if directory != '':
+            os.makedirs(directory, exist_ok=True)
+        with open(temporary, 'w', encoding='utf-8') as journal:
+            for record in records:
+                journal.write(json.dumps(record) + '\n')
+        os.replace(temporary, self.path)
+        self.file = open(self.path, 'a', encoding='utf-8')
+        return checkpoint
+
+    def started(self, file: CollectedFile) -> bool:
+        """
+        Whether documents of this file have been written.
+        """
+        return file_key(file) in self.documents
+
+    def completed(self, file: CollectedFile, index: int) -> bool:
+        """
+        Whether a document (the index-th of the file) has been written.
+        """
+        try:
+            return index in self.documents[file_key(file)]
+        except KeyError:
+            return False
+
+    def outputs(self, file: CollectedFile, index: int) -> List[str]:
+        """
+        The files written for a completed document.
+        """
+        return self.documents[file_key(file)][index]
+
+    def record(self, file: CollectedFile, index: int, outputs: List[str], checkpoint: Any) -> None:
+        """Records that a document has been written
+
+        Arguments:
+            file {CollectedFile} -- The file containing the document
+            index {int} -- Position of the document in the file
+            outputs {List[str]} -- The files written for the document
+            checkpoint {Any} -- State of the target after writing the document
+        """
+        journal = cast(TextIO, self.file)
+        journal.write(json.dumps({
+            'file': file_key(file),
+            'document': index,
+            'outputs': outputs,
+            'checkpoint': checkpoint
+        }) + '\n')
+        journal.flush()
+
+    def close(self) -> None:
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def finish(self) -> None:
+        """
+        Completes the conversion: nothing is left to resume.
+        """
+        self.close()
+        os.remove(self.path)
+
+    def __read(self) -> List[Dict[str, Any]]:
+        records = cast(List[Dict[str, Any]], [])
+        try:
+            with open(self.path, encoding='utf-8') as journal:
+                for line in journal:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        break
+        except FileNotFoundError:
+            pass
+        return records
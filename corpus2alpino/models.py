@@ -1,40 +1,218 @@
 #!/usr/bin/env python3
-from typing import Dict, Iterable, Optional
+from io import BytesIO, StringIO, TextIOWrapper
+from typing import cast, Any, BinaryIO, Callable, Dict, Iterable, Iterator, MutableMapping, Optional, TextIO, Tuple
+
+# number of characters used for determining the format of a file
+PREFIX_LENGTH = 400
+# number of metadata values to remember for interning
+INTERNED_SIZE = 10000
 
 
 class CollectedFile:
+    __slots__ = ('relpath', 'filename', 'mimetype', 'encoding', 'size', 'mtime', 'source', '__content', '__prefix',
+                 '__open')
+
     def __init__(
-        self, relpath: str, filename: str, mimetype: str, content: str
+        self, relpath: str, filename: str, mimetype: str, content: Optional[str] = None,
+        open: Optional[Callable[[], BinaryIO]] = None, encoding: str = 'utf-8',
+        size: Optional[int] = None, mtime: Optional[float] = None, source: Optional[str] = None
     ) -> None:
+        """A file found by a collector
+
+        Arguments:
+            relpath {str} -- Directory of the file, relative to the collected directory
+            filename {str} -- Name of the file
+            mimetype {str} -- Mime type of the file (if known)
+            content {Optional[str]} -- Content of the file
+            open {Optional[Callable[[], BinaryIO]]} -- Opens the file in binary
+                mode: used for reading the content when it is needed
+            encoding {str} -- Encoding of the file
+            size {Optional[int]} -- Size of the file in bytes (if known)
+            mtime {Optional[float]} -- Modification time of the file (if known)
+            source {Optional[str]} -- Path of the file on disk which contains it:
+                the file itself or e.g. the archive it was read from (if any)
+        """
         self.relpath = relpath
         self.filename = filename
         self.mimetype = mimetype
-        self.content = content
+        self.encoding = encoding
+        self.size = size
+        self.mtime = mtime
+        self.source = source
+        self.__content = content
+        self.__prefix = None  # type: Optional[str]
+        self.__open = open
+
+    @property
+    def content(self) -> str:
+        """
+        The entire content of the file. Readers which can process the
+        file incrementally should use stream() or lines() instead.
+        """
+        if self.__content is None:
+            with self.text() as file:
+                self.__content = file.read()
+        return self.__content
+
+    def stream(self) -> BinaryIO:
+        """
+        Opens the file as a binary stream, e.g. for parsing it using lxml.
+        """
+        if self.__content is not None:
+            return BytesIO(self.__content.encode('utf-8'))
+        return self.__get_open()()
+
+    def text(self) -> TextIO:
+        """
+        Opens the file as a text stream.
+        """
+        if self.__content is not None:
+            return StringIO(self.__content)
+        return TextIOWrapper(self.__get_open()(), encoding=self.encoding)
+
+    def lines(self) -> Iterator[str]:
+        """
+        The lines of the file (including their line breaks), read while
+        they are iterated.
+        """
+        if self.__content is None:
+            with self.text() as file:
+                yield from file
+            return
+
+        content = self.__content
+        start = 0
+        while start < len(content):
+            end = content.find('\n', start) + 1
+            if end == 0:
+                end = len(content)
+            yield content[start:end]
+            start = end
+
+    @property
+    def prefix(self) -> str:
+        """
+        The start of the file, for determining its format. This does
+        not read the entire file.
+        """
+        if self.__content is not None:
+            return self.__content[0:PREFIX_LENGTH]
+        if self.__prefix is None:
+            try:
+                with self.text() as file:
+                    self.__prefix = file.read(PREFIX_LENGTH)
+            except UnicodeDecodeError:
+                # not a text file (or in a different encoding)
+                self.__prefix = ''
+        return self.__prefix
+
+    def __get_open(self) -> Callable[[], BinaryIO]:
+        if self.__open is None:
+            raise ValueError("No content for {0}".format(self.filename))
+        return self.__open
+
+    @property
+    def suffix(self) -> str:
+        """
+        The last three characters of the filename in upper case: used
+        for recognizing the format by its extension.
+        """
+        return self.filename[-3:].upper()
 
 
 class MetadataValue:
-    def __init__(self, value: str, type: str = "text") -> None:
-        self.value = value
-        self.type = type
+    """
+    An immutable metadata value. The values are interned: creating a
+    value which was created recently returns that instance, so a value
+    which is repeated for many utterances (e.g. their speaker) is only
+    stored once.
+    """
+    __slots__ = ('value', 'type')
+    value: str
+    type: str
+
+    __interned = cast(Dict[Tuple[str, str], 'MetadataValue'], {})
+
+    def __new__(cls, value: str, type: str = "text") -> 'MetadataValue':
+        key = (value, type)
+        try:
+            return cls.__interned[key]
+        except KeyError:
+            pass
+        instance = super().__new__(cls)
+        object.__setattr__(instance, 'value', value)
+        object.__setattr__(instance, 'type', type)
+        if len(cls.__interned) >= INTERNED_SIZE:
+            # most values are only used once (e.g. line numbers): forget
+            # them, the repeated values are interned again when used
+            cls.__interned.clear()
+        cls.__interned[key] = instance
+        return instance
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("MetadataValue is immutable")
+
+    def __reduce__(self):
+        return (MetadataValue, (self.value, self.type))
 
 
 class Utterance:
+    __slots__ = ('text', 'id', 'metadata', 'line', 'annotations')
+
     def __init__(
         self,
         text: str,
         id: str,
-        metadata: Optional[Dict[str, MetadataValue]] = None,
+        metadata: Optional[MutableMapping[str, MetadataValue]] = None,
         line: int = 0,
-        annotations: Optional[Dict[str, str]] = None,
+        annotations: Optional[Dict[str, Any]] = None,
     ) -> None:
+        """
+        An utterance found in a document.
+
+        metadata: this can be a ChainMap, for inheriting the metadata
+            shared with other utterances (or the document) instead of
+            copying it. Changes are only made to its first mapping.
+
+        annotations: XML annotations of the utterance, each either
+            serialized as a string or as a parsed lxml element. It is
+            converted when the other form is needed, so it only has to be
+            parsed or serialized once.
+        """
         self.text = text
         self.id = id
-        self.metadata = metadata or {}
+        self.metadata = metadata if metadata is not None else {}
         self.line = line
         self.annotations = annotations or {}
 
+    def get_annotation_tree(self, key: str) -> Any:
+        """
+        Gets an annotation as a parsed lxml element, modifications of
+        this element are part of the annotation.
+        """
+        annotation = self.annotations[key]
+        if isinstance(annotation, str):
+            from lxml import etree
+            # encoded, because a string with an encoding declaration
+            # is not supported by lxml
+            annotation = etree.fromstring(annotation.encode("utf8"))
+            self.annotations[key] = annotation
+        return annotation
+
+    def get_annotation_text(self, key: str) -> str:
+        """
+        Gets an annotation serialized as a string.
+        """
+        annotation = self.annotations[key]
+        if isinstance(annotation, str):
+            return annotation
+        from lxml import etree
+        return etree.tostring(annotation, encoding="unicode", with_tail=False)
+
 
 class Document:
+    __slots__ = ('collected_file', 'utterances', 'subpath', 'metadata', 'annotations')
+
     def __init__(
         self,
         collected_file: CollectedFile,
@@ -51,9 +229,13 @@ class Document:
             the file. E.g. if a tei.xml contains a document A at the
             root and a document B
 
+        utterances: the utterances can be a stream, which is read
+            (and annotated) while the document is written. In that
+            case they can only be iterated once.
+
         """
         self.collected_file = collected_file
-        self.utterances = list(utterances)
+        self.utterances = utterances
         self.subpath = subpath
         self.metadata = metadata or {}
         self.annotations = annotations or {}
@@ -3,35 +3,89 @@
 Module for automatically detecting the reader to use for a file
 """
 
-from typing import Iterable
+from importlib import import_module
+from typing import cast, Dict, Iterable, List, NamedTuple, Optional
 
 from corpus2alpino.abstracts import Reader
-from corpus2alpino.models import CollectedFile, Document, MetadataValue
+from corpus2alpino.models import CollectedFile, Document
+from corpus2alpino.readers import formats
+from corpus2alpino.readers.formats import Format
+
+
+class RegisteredReader(NamedTuple):
+    format: Format
+    module: str
+    name: str
+    # whether the reader is constructed using a tokenizer
+    tokenizes: bool
+
+
+# the readers are only imported and constructed when a file of their
+# format is encountered
+registry = [
+    RegisteredReader(formats.chat, 'corpus2alpino.readers.chat', 'ChatReader', False),
+    RegisteredReader(formats.folia, 'corpus2alpino.readers.folia', 'FoliaReader', True),
+    RegisteredReader(formats.lassy, 'corpus2alpino.readers.lassy', 'LassyReader', False),
+    RegisteredReader(formats.paqu, 'corpus2alpino.readers.paqu', 'PaQuReader', True),
+    RegisteredReader(formats.tei, 'corpus2alpino.readers.tei', 'TeiReader', True)
+]
 
-from corpus2alpino.readers.chat import ChatReader
-from corpus2alpino.readers.folia import FoliaReader
-from corpus2alpino.readers.lassy import LassyReader
-from corpus2alpino.readers.paqu import PaQuReader
-from corpus2alpino.readers.tei import TeiReader
-from corpus2alpino.readers.tokenizer import Tokenizer
 
 class AutoReader(Reader):
     """
     Class for reading a file in any supported format.
     """
 
-    def __init__(self):
-        tokenizer = Tokenizer()
-        self.readers = [ChatReader(), FoliaReader(tokenizer), LassyReader(), PaQuReader(tokenizer), TeiReader(tokenizer)]
-
-    def read(self, file):
-        for reader in self.readers:
-            if reader.test_file(file):
-                return reader.read(file)
-        return []
-
-    def test_file(self, file):
-        for reader in self.readers:
-            if reader.test_file(file):
-                return True
-        return False
+    def __init__(self, custom_tokenizer=None):
+        self.tokenizer = custom_tokenizer
+        self.readers = cast(Dict[str, Reader], {})
+        # the readers which could accept a file with a given extension
+        self.candidates = cast(Dict[str, List[RegisteredReader]], {})
+
+    def read(self, file: CollectedFile) -> Iterable[Document]:
+        registered = self.find(file)
+        if registered is None:
+            return []
+        return self.get_reader(registered).read(file)
+
+    def test_file(self, file: CollectedFile) -> bool:
+        return self.find(file) is not None
+
+    def find(self, file: CollectedFile) -> Optional[RegisteredReader]:
+        """
+        Finds the reader for a file. Only the start of the file is read
+        and only if the extension of the file isn't conclusive.
+        """
+        try:
+            candidates = self.candidates[file.suffix]
+        except KeyError:
+            candidates = [registered for registered in registry
+                          if registered.format.extension in [None, file.suffix]]
+            self.candidates[file.suffix] = candidates
+
+        for registered in candidates:
+            if registered.format.test_file(file):
+                return registered
+        return None
+
+    def configuration(self) -> str:
+        tokenizer = type(self.tokenizer).__name__ \
+            if self.tokenizer is not None else 'Tokenizer'
+        return 'AutoReader tokenizer={0}'.format(tokenizer)
+
+    def get_reader(self, registered: RegisteredReader) -> Reader:
+        try:
+            return self.readers[registered.name]
+        except KeyError:
+            reader_class = getattr(import_module(
+                registered.module), registered.name)
+            if registered.tokenizes:
+                if self.tokenizer is None:
+                    from corpus2alpino.readers.tokenizer import Tokenizer
+                    # shared by all the readers
+                    self.tokenizer = Tokenizer()
+                reader = reader_class(self.tokenizer)
+            else:
+                reader = reader_class()
+            self.readers[registered.name] = reader
+            return reader
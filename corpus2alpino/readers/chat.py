@@ -2,7 +2,8 @@
 """
 Module for reading CHAT cha files to parsable utterances.
 """
-from typing import cast, Dict, Iterable, List, Tuple
+from collections import ChainMap
+from typing import cast, Dict, Iterable, List, Optional, Tuple
 from chamd import ChatReader as ChatParser, ChatLine, ChatTier
 
 import os
@@ -10,9 +11,12 @@ import re
 
 from corpus2alpino.abstracts import Reader
 from corpus2alpino.models import CollectedFile, Document, MetadataValue, Utterance
+from corpus2alpino.readers import formats
 
 MANUAL_IDS = ['xsid', 'xuid']
 UTTERANCE_NUMBER_ID = 'uttno'
+# metadata which differs for every utterance
+UTTERANCE_METADATA = ['origutt', 'parsefile', 'uttid', 'uttstartlineno', 'uttendlineno']
 
 class ChatReader(Reader):
     """
@@ -23,11 +27,15 @@ class ChatReader(Reader):
         self.reader = ChatParser()
         chat = self.reader.read_string(
             collected_file.content, collected_file.filename)
+        metadata = self.parse_metadata(chat.metadata)
         yield Document(collected_file,
-                       list(self.parse_utterances(chat.lines)),
-                       self.parse_metadata(chat.metadata))
+                       self.parse_utterances(chat.lines, metadata),
+                       metadata)
 
-    def parse_utterances(self, chat_lines: List[ChatLine]):
+    def parse_utterances(self, chat_lines: List[ChatLine], doc_metadata: Optional[Dict[str, MetadataValue]] = None):
+        # the metadata which isn't specific for an utterance (e.g. that of
+        # its speaker) is stored once and shared by the utterances
+        layers = cast(Dict[Tuple[Tuple[str, MetadataValue], ...], Dict[str, MetadataValue]], {})
         number = 0
         for line in chat_lines:
             number += 1  # start numbering utterances from 1
@@ -39,13 +47,20 @@ class ChatReader(Reader):
                 except KeyError:
                     pass
 
+            metadata = cast(Dict[str, MetadataValue], {})
+            shared = cast(Dict[str, MetadataValue], {})
+            for (key, value) in self.parse_metadata(line.metadata).items():
+                if key in UTTERANCE_METADATA:
+                    metadata[key] = value
+                else:
+                    shared[key] = value
+            metadata.update(self.parse_tiers(line.tiers))
+            metadata[UTTERANCE_NUMBER_ID] = MetadataValue(str(number), 'int')
+            shared = layers.setdefault(tuple(shared.items()), shared)
+
             yield Utterance(line.text,
                             str(line.uttid),
-                            {
-                                **self.parse_metadata(line.metadata),
-                                **self.parse_tiers(line.tiers),
-                                UTTERANCE_NUMBER_ID: MetadataValue(str(number), 'int')
-                            },
+                            ChainMap(metadata, shared, doc_metadata or {}),
                             int(line.metadata['uttstartlineno'].text))
 
     def parse_metadata(self, metadata) -> Dict[str, MetadataValue]:
@@ -66,4 +81,4 @@ class ChatReader(Reader):
         Determine whether this is a CHAT file
         """
 
-        return file.filename[-3:].upper() == 'CHA'
+        return formats.chat.test_file(file)
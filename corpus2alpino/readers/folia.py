@@ -3,20 +3,41 @@
 Module for converting FoLiA xml files to parsable utterances.
 """
 
-from typing import Iterable
+from typing import cast, Iterable, List, Optional, Tuple, TYPE_CHECKING
+from lxml import etree
 
 from corpus2alpino.abstracts import Reader
 from corpus2alpino.models import CollectedFile, Document, MetadataValue, Utterance
-from corpus2alpino.readers.tokenizer import Tokenizer
-
-import folia.main as folia
+from corpus2alpino.readers import formats
+from corpus2alpino.readers.tokenizer import Sentence, Tokenizer
 
 from .alpino_brackets import escape_id, escape_word, format_add_lex, format_folia
 
+# the FoLiA library is only loaded for documents which aren't
+# (completely) tokenized
+if TYPE_CHECKING:
+    import folia.main as folia
+
+FOLIA_NAMESPACE = '{http://ilk.uvt.nl/folia}'
+XML_ID = '{http://www.w3.org/XML/1998/namespace}id'
+
+# elements which can be part of a tokenized document, without affecting
+# the words or the sentences they belong to
+tokenized_elements = set(FOLIA_NAMESPACE + name for name in [
+    'FoLiA', 'text', 'div', 'head', 'p', 's', 'w', 't', 'pos', 'lemma', 'feat',
+    'lang', 'str', 'alignment', 'aref', 'desc', 'comment', 'br', 'whitespace',
+    'entities', 'entity', 'chunking', 'chunk', 'dependencies', 'dependency',
+    'hd', 'dep', 'syntax', 'su', 'wref', 'timing', 'timesegment', 'sense',
+    'semroles', 'semrole', 'coreferences', 'coreferencechain',
+    'coreferencelink', 'metric'])
+
 
 class FoliaReader(Reader):
     """
-    Class for converting FoLiA xml files to documents.
+    Class for converting FoLiA xml files to documents. Documents which are
+    already tokenized into sentences (<s>) and words (<w>) are streamed
+    using lxml, other documents are read (and tokenized) using the FoLiA
+    library.
     """
 
     def __init__(self, custom_tokenizer=None) -> None:
@@ -24,6 +45,17 @@ class FoliaReader(Reader):
 
     def read(self, collected_file: CollectedFile) -> Iterable[Document]:
         try:
+            native_metadata = self.scan_tokenized(collected_file)
+            if native_metadata is not None:
+                doc_metadata = self.get_metadata_dict(native_metadata)
+                yield Document(
+                    collected_file,
+                    self.stream_utterances(collected_file),
+                    doc_metadata,
+                )
+                return
+
+            import folia.main as folia
             doc = folia.Document(
                 string=collected_file.content,
                 autodeclare=True,
@@ -42,14 +74,186 @@ class FoliaReader(Reader):
                 collected_file.relpath + "/" + collected_file.filename
             ) from e
 
+    def scan_tokenized(self, collected_file: CollectedFile) -> Optional[List[Tuple[str, str]]]:
+        """
+        Checks whether the document only contains tokenized text in the
+        elements supported by stream_utterances.
+
+        Returns:
+            Optional[List[Tuple[str, str]]] -- The native metadata of the
+            document or None if the FoLiA library should be used
+        """
+        native_metadata = cast(List[Tuple[str, str]], [])
+        in_metadata = False
+        # for each open paragraph: whether it contains a sentence
+        paragraphs = cast(List[bool], [])
+        # for each open text: whether it contains any elements
+        texts = cast(List[bool], [])
+
+        with collected_file.stream() as stream:
+            for event, element in etree.iterparse(stream, events=('start', 'end')):
+                tag = element.tag
+                if event == 'start':
+                    if tag == FOLIA_NAMESPACE + 'metadata':
+                        if element.get('type', 'native') != 'native' or element.get('src') is not None:
+                            return None
+                        in_metadata = True
+                    elif not in_metadata:
+                        if tag not in tokenized_elements or element.get('metadata') is not None:
+                            return None
+                        texts = [True] * len(texts)
+                        if tag == FOLIA_NAMESPACE + 'text':
+                            texts.append(False)
+                        elif tag == FOLIA_NAMESPACE + 'p':
+                            paragraphs.append(False)
+                        elif tag == FOLIA_NAMESPACE + 's':
+                            paragraphs = [True] * len(paragraphs)
+                    continue
+
+                if in_metadata:
+                    if tag == FOLIA_NAMESPACE + 'metadata':
+                        in_metadata = False
+                    elif tag == FOLIA_NAMESPACE + 'meta':
+                        native_metadata.append(
+                            (element.get('id'), element.text or ''))
+                    elif tag in [FOLIA_NAMESPACE + 'submetadata', FOLIA_NAMESPACE + 'foreign-data']:
+                        return None
+                    continue
+
+                if tag in [FOLIA_NAMESPACE + 'p', FOLIA_NAMESPACE + 's', FOLIA_NAMESPACE + 'w']:
+                    if element.get(XML_ID) is None:
+                        return None
+                    if tag == FOLIA_NAMESPACE + 'p' and not paragraphs.pop():
+                        # untokenized paragraph
+                        return None
+                    self.release(element)
+                elif tag == FOLIA_NAMESPACE + 'text':
+                    if not texts.pop():
+                        # untokenized text
+                        return None
+                elif tag == FOLIA_NAMESPACE + 't':
+                    if len(element) > 0:
+                        # text markup
+                        return None
+
+            return native_metadata
+
+    def stream_utterances(self, collected_file: CollectedFile) -> Iterable[Utterance]:
+        """
+        Reads the utterances of a tokenized document, word by word. This
+        results in the same utterances as get_utterances.
+        """
+        # the open sentences and paragraphs: (serial number, id, line)
+        sentences = cast(List[Tuple[int, str, int]], [])
+        paragraphs = cast(List[Tuple[int, str, int]], [])
+        serial = 0
+        container = None  # type: Optional[Tuple[Optional[int], Optional[int]]]
+        container_element = None  # type: Optional[Tuple[int, str, int]]
+        words = cast(List[str], [])
+
+        try:
+            with collected_file.stream() as stream:
+                for event, element in etree.iterparse(stream, events=('start', 'end'),
+                                                      tag=[FOLIA_NAMESPACE + 'p', FOLIA_NAMESPACE + 's', FOLIA_NAMESPACE + 'w']):
+                    tag = element.tag
+                    if event == 'start':
+                        if tag == FOLIA_NAMESPACE + 's':
+                            serial += 1
+                            sentences.append(
+                                (serial, element.get(XML_ID), element.sourceline))
+                        elif tag == FOLIA_NAMESPACE + 'p':
+                            serial += 1
+                            paragraphs.append(
+                                (serial, element.get(XML_ID), element.sourceline))
+                        continue
+
+                    if tag == FOLIA_NAMESPACE + 'w':
+                        sentence = sentences[-1] if sentences else None
+                        paragraph = paragraphs[-1] if paragraphs else None
+                        word_container = (sentence[0] if sentence else None,
+                                          paragraph[0] if paragraph else None)
+                        if word_container != container:
+                            if words and container_element is not None:
+                                yield self.create_streamed_utterance(container_element, words)
+                            words = []
+                            container = word_container
+                            container_element = sentence or paragraph
+                        words.append(self.get_element_string(element))
+                        self.release(element)
+                    elif tag == FOLIA_NAMESPACE + 's':
+                        sentences.pop()
+                        self.release(element)
+                    elif tag == FOLIA_NAMESPACE + 'p':
+                        paragraphs.pop()
+                        self.release(element)
+
+                if words and container_element is not None:
+                    yield self.create_streamed_utterance(container_element, words)
+        except Exception as e:
+            raise Exception(
+                collected_file.relpath + "/" + collected_file.filename
+            ) from e
+
+    def release(self, element) -> None:
+        """
+        Removes a processed element (and its preceding siblings) from the
+        tree, to keep the memory usage independent of the size of the
+        document. The element itself is only cleared: the parser could
+        still add its tail.
+        """
+        element.clear(keep_tail=True)
+        parent = element.getparent()
+        if parent is not None:
+            while element.getprevious() is not None:
+                del parent[0]
+
+    def create_streamed_utterance(self, container: Tuple[int, str, int], words: List[str]) -> Utterance:
+        (_, container_id, line_number) = container
+        line = " ".join(filter(lambda word: word != "", words))
+        return Utterance(line, escape_id(container_id), {}, line_number)
+
+    def get_element_string(self, word) -> str:
+        """
+        Get a string representing a word element (as get_word_string does).
+        """
+        text = None
+        for item in word.iterchildren(FOLIA_NAMESPACE + 't'):
+            if item.get('class', 'current') == 'current':
+                text = item.text
+                break
+            if text is None:
+                text = item.text
+        if text is None:
+            return ""
+        text = text.strip()
+
+        lemma = word.find(FOLIA_NAMESPACE + 'lemma')
+        pos = word.find(FOLIA_NAMESPACE + 'pos')
+        if lemma is not None and pos is not None and \
+                lemma.get('class') and pos.get('class'):
+            return format_folia(lemma.get('class'), pos.get('class'), text)
+
+        return escape_word(text)
+
     def tokenize(self, element):
         """
         Tokenizes all the text which isn't tokenized yet.
         """
+        untokenized = list(self.untokenized(element))
+        tokenized = self.tokenizer.process_all(
+            text for (text, _) in untokenized)
+        for ((_, element), sentences) in zip(untokenized, tokenized):
+            self.add_sentences(sentences, element)
+
+    def untokenized(self, element) -> Iterable[Tuple[str, 'folia.AbstractElement']]:
+        """
+        Finds the elements (and their text) which haven't been tokenized.
+        """
+        import folia.main as folia
         if len(element) == 0:
             # no sub elements
             if isinstance(element, folia.Text):
-                self.tokenize_element(element.text(), element)
+                yield (element.text(), element)
             return
 
         for item in element:
@@ -58,18 +262,19 @@ class FoliaReader(Reader):
                     for _ in item.sentences():
                         break
                     else:
-                        self.tokenize_paragraph(item)
+                        yield (self.paragraph_text(item), item)
                 else:
-                    self.tokenize(item)
+                    yield from self.untokenized(item)
 
-    def tokenize_paragraph(self, paragraph: folia.Paragraph):
+    def paragraph_text(self, paragraph: 'folia.Paragraph') -> str:
+        import folia.main as folia
         text = ""
         for text_content in paragraph.select(folia.TextContent):
             text += text_content.text()
-        self.tokenize_element(text, paragraph)
+        return text
 
-    def tokenize_element(self, text: str, element: folia.AbstractElement):
-        sentences = self.tokenizer.process(text)
+    def add_sentences(self, sentences: Iterable[Sentence], element: 'folia.AbstractElement'):
+        import folia.main as folia
         for line in sentences:
             sentence = element.add(folia.Sentence)
             for word in line.tokens():
@@ -80,6 +285,7 @@ class FoliaReader(Reader):
         """
         Read FoLiA file and return Alpino parsable sentences.
         """
+        import folia.main as folia
 
         paragraph = None
         sentence = None
@@ -135,6 +341,7 @@ class FoliaReader(Reader):
         """
         Get a string representing this word and any additional known properties to add to the parse.
         """
+        import folia.main as folia
 
         try:
             text = word.toktext()
@@ -185,4 +392,4 @@ class FoliaReader(Reader):
         Determine whether this is a FoLiA XML file
         """
 
-        return "<FoLiA" in file.content[0:400]
+        return formats.folia.test_file(file)
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Module for determining the format of a file, without loading the
+libraries needed for reading it. The format is recognized by the
+extension of the file or by a marker in the start of the file: the
+rest of the file isn't read.
+"""
+
+from typing import NamedTuple, Optional, Tuple
+
+from corpus2alpino.models import CollectedFile
+
+
+class Format(NamedTuple):
+    name: str
+    # extension (the last three characters of the filename in upper case)
+    extension: Optional[str] = None
+    # texts of which one is expected in the start of the file
+    markers: Tuple[str, ...] = ()
+
+    def test_file(self, file: CollectedFile) -> bool:
+        if self.extension is not None:
+            return file.suffix == self.extension
+        return any(marker in file.prefix for marker in self.markers)
+
+
+chat = Format('chat', extension='CHA')
+folia = Format('folia', markers=('<FoLiA',))
+lassy = Format('lassy', markers=('<alpino_ds',))
+paqu = Format('paqu', extension='TXT')
+# a corpus can have a long header before its first document
+tei = Format('tei', markers=('<TEI', '<teiCorpus'))
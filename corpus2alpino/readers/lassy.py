@@ -5,30 +5,29 @@ Module for reading Lassy/Alpino xml files.
 
 from typing import Iterable
 from lxml import etree
-import re
 
 from .alpino_brackets import escape_id, escape_word, format_add_lex, format_folia
 from corpus2alpino.abstracts import Reader
 from corpus2alpino.annotators.alpino import ANNOTATION_KEY
 from corpus2alpino.models import CollectedFile, Document, MetadataValue, Utterance
-
-xml_header = re.compile(r'<\?xml +version="\d.\d" +encoding="UTF-?8"\?>', re.IGNORECASE)
+from corpus2alpino.readers import formats
 
 class LassyReader(Reader):
     """
     Class for converting Lassy/Alpino xml (treebank) files to documents.
+    Treebanks are read incrementally: each utterance is parsed and
+    released from the treebank when it is reached.
     """
 
     def read(self, collected_file: CollectedFile) -> Iterable[Document]:
         try:
-            # Unicode strings with encoding declaration are not supported.
-            content = xml_header.sub("", collected_file.content)
-            root = etree.fromstring(content)
-            if '<treebank' in content[0:400]:
+            if '<treebank' in collected_file.prefix:
                 yield Document(
                     collected_file,
-                    [self.get_utterance(tree, lineno+1) for (lineno, tree) in enumerate(root.iter("alpino_ds"))])
+                    self.read_treebank(collected_file))
             else:
+                with collected_file.stream() as stream:
+                    root = etree.parse(stream).getroot()
                 yield Document(
                     collected_file,
                     [self.get_utterance(root)])
@@ -36,6 +35,26 @@ class LassyReader(Reader):
             raise Exception(collected_file.relpath + "/" +
                             collected_file.filename) from e
 
+    def read_treebank(self, collected_file: CollectedFile) -> Iterable[Utterance]:
+        try:
+            with collected_file.stream() as stream:
+                trees = etree.iterparse(stream,
+                                        events=('end',),
+                                        tag='alpino_ds')
+                for (lineno, (_, tree)) in enumerate(trees):
+                    # detach the previous utterances from the treebank: they
+                    # are no longer needed there and can be released once
+                    # they have been processed. The current utterance is
+                    # left in place, the parser could still add its tail.
+                    parent = tree.getparent()
+                    if parent is not None:
+                        while tree.getprevious() is not None:
+                            del parent[0]
+                    yield self.get_utterance(tree, lineno + 1)
+        except Exception as e:
+            raise Exception(collected_file.relpath + "/" +
+                            collected_file.filename) from e
+
     def get_utterance(self, tree, line_number: int = 1) -> Utterance:
         """
         Read Alpino lxml Element and returns an Utterance object.
@@ -62,8 +81,7 @@ class LassyReader(Reader):
             # remove metadata element from output,
             # this metadata is now in the Utterance
             tree.remove(metadata_element)
-        xml = etree.tostring(tree, encoding='utf8').decode('utf8')
-        utterance.annotations[ANNOTATION_KEY] = xml.strip()
+        utterance.annotations[ANNOTATION_KEY] = tree
         return utterance
 
     def get_metadata(self, tree):
@@ -79,4 +97,4 @@ class LassyReader(Reader):
         Determine whether this is an Alpino/Lassy XML file
         """
 
-        return '<alpino_ds' in file.content[0:400]
+        return formats.lassy.test_file(file)
@@ -2,6 +2,7 @@
 """
 Module for reading (PaQu metadata) plain text files to parsable utterances.
 """
+from collections import ChainMap
 from typing import cast, Dict, Iterable, List, Tuple, Optional
 
 import os
@@ -9,6 +10,7 @@ import re
 
 from corpus2alpino.abstracts import Reader
 from corpus2alpino.models import CollectedFile, Document, MetadataValue, Utterance
+from corpus2alpino.readers import formats
 from corpus2alpino.readers.tokenizer import Tokenizer
 
 metadata_pattern = re.compile(r'^##META ([^\s]+) ([^\s]+) ?= ?(.*)$')
@@ -73,7 +75,8 @@ class PaQuReader(Reader):
                            self.get_subpath(metadata))
 
     def parse_utterances(self, metadata: Dict[str, MetadataValue], text_lines: List[Tuple[Optional[str], str]]):
-        for i in range(0, len(text_lines)):
+        tokenized = self.tokenizer.process_all(text for (_, text) in text_lines)
+        for i, sentences in enumerate(tokenized):
             (id, text) = text_lines[i]
             if id == None:
                 try:
@@ -81,10 +84,11 @@ class PaQuReader(Reader):
                 except KeyError:
                     id = str(i)
             j = 0
-            for sentence in self.tokenizer.process(text):
+            for sentence in sentences:
+                # the utterances share the metadata, but can each add their own
                 yield Utterance(sentence.text(),
                                 '{0}-{1}'.format(id, j),
-                                metadata,
+                                ChainMap({}, metadata),
                                 i)
                 j += 1
 
@@ -93,7 +97,7 @@ class PaQuReader(Reader):
         Determine whether this is a TXT file
         """
 
-        return file.filename[-3:].upper() == 'TXT'
+        return formats.paqu.test_file(file)
 
     def get_subpath(self, metadata: Dict[str, MetadataValue]) -> str:
         for key in ['id', 'messageid']:
@@ -2,18 +2,18 @@
 """
 Module for reading TEI xml files to document, utterances and metadata.
 """
-from typing import Dict, Iterable, List, Tuple
-from tei_reader import TeiReader as TeiParser
-from tei_reader.models.part import Part
-from tei_reader.models.placeholder_division import PlaceholderDivision
+from itertools import tee
+from typing import cast, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import os
 import re
 
 from corpus2alpino.abstracts import Reader
 from corpus2alpino.models import CollectedFile, Document, MetadataValue, Utterance
+from corpus2alpino.readers import formats
 
 from corpus2alpino.readers.alpino_brackets import escape_id, format_folia
+from corpus2alpino.readers.tei_parser import TeiDocument, TeiParser
 from corpus2alpino.readers.tokenizer import Tokenizer
 
 alignable_characters = re.compile(r'[A-Za-zàéëüïóò,\.:;0123456789]')
@@ -21,53 +21,106 @@ nonalignable_characters = re.compile(r'[^A-Za-zàéëüïóò,\.:;0123456789]')
 
 
 class TokenizedSentenceEmitter:
-    offset = 0
+    """
+    Aligns the text of the parts of a division with the tokenized
+    sentences of that division. The sentences are read using a cursor
+    (the current sentence and the offset within that sentence), so
+    aligning a division takes linear time.
+    """
 
     def __init__(self, sentences: List[str]) -> None:
         self.sentences = sentences
+        # current sentence, including its line break
+        self.index = 0
+        self.sentence = ''
+        # positions and values of the alignable characters of the sentence
+        self.positions = cast(List[int], [])
+        self.alignable = ''
+        # position in the sentence and the number of alignable
+        # characters before that position
+        self.offset = 0
+        self.aligned = 0
+        self.__load_sentence()
+
+    def __load_sentence(self) -> None:
+        if self.index < len(self.sentences):
+            self.sentence = self.sentences[self.index] + '\n'
+            self.positions = [match.start() for match in
+                              alignable_characters.finditer(self.sentence)]
+            self.alignable = ''.join(self.sentence[position]
+                                     for position in self.positions)
+        self.offset = 0
+        self.aligned = 0
 
     def __get_alignable_text(self, text: str) -> str:
         return nonalignable_characters.sub('', text)
 
-    def get_sentences(self, part_text: str, part_offset: int=0) -> Iterable[str]:
-        if not self.sentences:
-            return
-        sentence = self.sentences[0] + '\n'
-
-        remaining_sentence = sentence[self.offset:]
-
-        alignable_text = self.__get_alignable_text(part_text)
-
-        (sentence_length, part_offset, part_done) = self.get_part_length(
-            remaining_sentence, alignable_text, part_offset)
-        yield remaining_sentence[:sentence_length]
-        if part_done:
-            self.offset += sentence_length
-        else:
-            self.offset = 0
-            # move to next sentence
-            self.sentences = self.sentences[1:]
-            yield from self.get_sentences(part_text, part_offset)
-
-    def get_part_length(self, sentence: str, alignable_text: str, n: int=0) -> Tuple[int, int, bool]:
+    def get_sentences(self, part_text: str) -> Iterable[str]:
         """
-        Return the actual string length of this part in the sentence and the index of the alignable character match
-        in this part. This index is relevant if a part is split over multiple sentences
+        Splits the text of a part over the sentences, e.g. ("Een zin. Nog")
+        would be split as ("Een zin.\n", "Nog"). A line break indicates the
+        end of a sentence.
         """
+        alignable_text = self.__get_alignable_text(part_text)
+        n = 0
+        while self.index < len(self.sentences):
+            # compare as many characters as possible in one go
+            length = min(len(self.alignable) - self.aligned,
+                         len(alignable_text) - n)
+            if self.alignable[self.aligned:self.aligned + length] != alignable_text[n:n + length]:
+                self.__alignment_error(alignable_text, n)
+            self.aligned += length
+            n += length
+
+            if self.aligned < len(self.alignable):
+                # the part is done: it ends before the next alignable
+                # character of the sentence
+                end = self.positions[self.aligned]
+                yield self.sentence[self.offset:end]
+                self.offset = end
+                return
+
+            # the entire sentence matches: move to the next sentence
+            yield self.sentence[self.offset:]
+            self.index += 1
+            self.__load_sentence()
+
+    def __alignment_error(self, alignable_text: str, n: int):
+        i = self.aligned
+        while i < len(self.alignable) and n < len(alignable_text) and \
+                self.alignable[i] == alignable_text[n]:
+            i += 1
+            n += 1
+        raise Exception(
+            "Alignment error at ({0}, {1})! Sentence: {2} Part: {3}".format(
+                self.positions[i] - self.offset, n, self.sentence[self.offset:], alignable_text))
+
+
+class SiblingMetadata:
+    """
+    Combines the metadata of sibling parts, as merge_metadata_sibbling
+    does, without merging all the preceding siblings again for every
+    part.
+    """
 
-        for i, char in enumerate(sentence):
-            if alignable_characters.match(char):
-                if len(alignable_text) == n:
-                    # part of the sentence matches
-                    return (i, n, True)
-                if alignable_text[n] != char:
-                    # this part doesn't match
-                    raise Exception(
-                        "Alignment error at ({0}, {1})! Sentence: {2} Part: {3}".format(i, n, sentence, alignable_text))
-                n += 1
+    def __init__(self) -> None:
+        # the first value of each key and the combined values (if there are multiple)
+        self.values = cast(Dict[str, Tuple[MetadataValue, Optional[Set[str]]]], {})
+
+    def add(self, metadata: Dict[str, MetadataValue]) -> None:
+        for (key, data) in metadata.items():
+            if key in self.values:
+                (first, combined) = self.values[key]
+                if combined is None:
+                    combined = set(first.value.split(' | '))
+                combined.update(data.value.split(' | '))
+                self.values[key] = (first, combined)
+            else:
+                self.values[key] = (data, None)
 
-        # the entire sentence matches
-        return (len(sentence), n, False)
+    def get(self) -> Dict[str, MetadataValue]:
+        return dict((key, first if combined is None else MetadataValue(' | '.join(sorted(combined))))
+                    for (key, (first, combined)) in self.values.items())
 
 
 class TeiReader(Reader):
@@ -80,51 +133,53 @@ class TeiReader(Reader):
         self.tokenizer = custom_tokenizer if custom_tokenizer else Tokenizer()
 
     def read(self, collected_file: CollectedFile) -> Iterable[Document]:
-        corpora = self.reader.read_string(collected_file.content)
-
-        for document in corpora.documents:
-            # an id should be unique within a document
-            unique_ids = {} # type: ignore
+        for document in self.reader.read(collected_file.lines()):
             doc_metadata = self.get_element_metadata(document.attributes)
-            utterances = []
-            for (division_path, div_metadata) in self.get_lowest_divisions(
-                    document.divisions):
-                division = division_path[-1]
-
-                self.tokenizer.process(division.text)
-                sentence_emitter = TokenizedSentenceEmitter(
-                    list(' '.join(sentence.tokens()) for sentence in self.tokenizer.sentences()))
-
-                # aggregate all the metadata of the sentence parts
-                annotated_sentences = [('', {})] # type: ignore
-
-                for (text, metadata, newline) in self.annotate_parts(
-                        division.parts, sentence_emitter):
-                    (current_text, current_metadata) = annotated_sentences[-1]
-                    annotated_sentences[-1] = (
-                        current_text + text,
-                        self.merge_metadata_sibbling(current_metadata, metadata))
-                    if newline:
-                        annotated_sentences.append(('', {}))
-
-                for [sentence, sentence_metadata] in annotated_sentences:
-                    if not sentence:
-                        # empty sentence
-                        continue
-
-                    # assume the metadata of the divider is more relevant
-                    metadata = self.merge_metadata_child(
-                        sentence_metadata, div_metadata)
-                    sentence_id = self.determine_id(
-                        collected_file.filename,
-                        doc_metadata,
-                        metadata,
-                        unique_ids)
-
-                    utterances.append(
-                        Utterance(sentence.replace('  ', ' '), sentence_id, metadata))
             # TODO: get document id/path?
-            yield Document(collected_file, utterances, doc_metadata)
+            yield Document(collected_file,
+                           self.read_utterances(collected_file, document, doc_metadata),
+                           doc_metadata)
+
+    def read_utterances(self, collected_file: CollectedFile, document: TeiDocument,
+                        doc_metadata: Dict[str, MetadataValue]) -> Iterator[Utterance]:
+        # an id should be unique within a document
+        unique_ids = {} # type: ignore
+        (divisions, division_texts) = tee(self.get_lowest_divisions(document.divisions))
+        tokenized = self.tokenizer.process_all(
+            division_path[-1].text for (division_path, _) in division_texts)
+        for ((division_path, div_metadata), sentences) in zip(divisions, tokenized):
+            division = division_path[-1]
+
+            sentence_emitter = TokenizedSentenceEmitter(
+                list(sentence.text() for sentence in sentences))
+
+            # aggregate all the metadata of the sentence parts
+            annotated_sentences = [([], SiblingMetadata())] # type: List[Tuple[List[str], SiblingMetadata]]
+
+            for (text, metadata, newline) in self.annotate_parts(
+                    division.parts, sentence_emitter):
+                (current_text, current_metadata) = annotated_sentences[-1]
+                current_text.append(text)
+                current_metadata.add(metadata)
+                if newline:
+                    annotated_sentences.append(([], SiblingMetadata()))
+
+            for (sentence_parts, sentence_metadata) in annotated_sentences:
+                sentence = ''.join(sentence_parts)
+                if not sentence:
+                    # empty sentence
+                    continue
+
+                # assume the metadata of the divider is more relevant
+                metadata = self.merge_metadata_child(
+                    sentence_metadata.get(), div_metadata)
+                sentence_id = self.determine_id(
+                    collected_file.filename,
+                    doc_metadata,
+                    metadata,
+                    unique_ids)
+
+                yield Utterance(sentence.replace('  ', ' '), sentence_id, metadata)
 
     def determine_id(self, file_name, doc_metadata, sentence_metadata, unique_ids: Dict[str, int]):
         if 'id' in doc_metadata:
@@ -157,7 +212,8 @@ class TeiReader(Reader):
         metadata = {} # type: ignore
         for attribute in attributes:
             if attribute.key in metadata:
-                metadata[attribute.key].value += ' | ' + attribute.text
+                metadata[attribute.key] = MetadataValue(
+                    metadata[attribute.key].value + ' | ' + attribute.text)
             else:
                 metadata[attribute.key] = MetadataValue(attribute.text)
         return metadata
@@ -167,7 +223,7 @@ class TeiReader(Reader):
         Determine whether this is a TEI XML file
         """
 
-        return '<TEI' in file.content[0:400]
+        return formats.tei.test_file(file)
 
     def merge_metadata_sibbling(self, prev, current):
         result = {**prev, **current}
@@ -194,21 +250,22 @@ class TeiReader(Reader):
     def annotate_parts(
             self, parts, sentence_emitter: TokenizedSentenceEmitter):
         for part in parts:
-            text = ''
-            metadata = {} # type: ignore
+            texts = cast(List[str], [])
+            metadata = SiblingMetadata()
             empty = True
             part_metadata = self.get_element_metadata(part.attributes)
             for (subpart_text, subpart_metadata, newline) in \
                     self.annotate_parts(part.parts, sentence_emitter):
                 empty = False
-                text += subpart_text
-                metadata = self.merge_metadata_sibbling(
-                    metadata, subpart_metadata)
+                texts.append(subpart_text)
+                metadata.add(subpart_metadata)
 
                 if newline:
-                    yield self.emit_part(text, metadata, part_metadata, True)
-                    metadata = {}
-                    text = ''
+                    yield self.emit_part(''.join(texts), metadata.get(), part_metadata, True)
+                    metadata = SiblingMetadata()
+                    texts = []
+
+            text = ''.join(texts)
 
             if empty:
                 # has no child
@@ -216,7 +273,7 @@ class TeiReader(Reader):
                 if sentences:
                     for sentence in sentences[:-1]:
                         text += sentence
-                        yield self.emit_part(text, metadata, part_metadata, True)
+                        yield self.emit_part(text, metadata.get(), part_metadata, True)
                         text = ''
 
                     text += self.inline_metadata(
@@ -224,7 +281,7 @@ class TeiReader(Reader):
 
             if text:
                 yield self.emit_part(text,
-                                     metadata,
+                                     metadata.get(),
                                      part_metadata,
                                      False)
 
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Module for streaming the documents of a TEI xml file. The file is parsed
+using lxml and every <text> (or <div>) of a <TEI> document is converted
+to divisions, parts and attributes as soon as it has been read, after
+which it is freed. This uses the transformation and models of tei_reader,
+so the divisions are the same as those of tei_reader.TeiReader; which
+parses the entire file and creates all its documents at once.
+"""
+
+import re
+from copy import deepcopy
+from os import path
+from typing import cast, Any, Iterable, Iterator, List, Tuple
+
+# remove the namespaces: the transformation expects unqualified names
+xmlns = re.compile(r' *xmlns(|\:\w+)="[^"]*"')
+invalid_ampersand = re.compile(r'&(?=[ <])')
+
+document_tags = ['TEI', 'TEI.2']
+# the children of a document which contain its divisions
+division_tags = ['text', 'div']
+header_tag = 'teiHeader'
+
+# number of characters to pass to the parser at once
+FEED_SIZE = 64 * 1024
+# number of texts to transform at once
+TRANSFORM_SIZE = 50
+
+Event = Tuple[str, Any]
+
+
+def clean_line(line: str) -> str:
+    # tei_reader joins the lines without line breaks
+    line = xmlns.sub('', line.rstrip('\n'))
+    return invalid_ampersand.sub('&amp;', line)
+
+
+def assign_beginnings(xml: Any) -> Any:
+    """
+    Line and page beginnings are milestones: the content following them
+    (up to the next beginning) is moved into them, as tei_reader does.
+    """
+    def rename_n_attribute(element, name):
+        for n in element.xpath('attributes/attribute[@key]'):
+            n.attrib['key'] = name
+
+    # A div can contain parts, but parts cannot contain divs: a sentence
+    # can be split over parts, but not over divs.
+    for line in xml.xpath('//lb'):
+        rename_n_attribute(line, 'line')
+        division = False
+        for sibling in line.itersiblings():
+            if sibling.tag in ['lb', 'pb']:
+                break
+            for descendant in sibling.iterdescendants():
+                if descendant.tag in ['lb', 'pb']:
+                    break
+                if descendant.tag == 'div':
+                    division = True
+            line.append(sibling)
+        line.tag = 'div' if division else 'part'
+
+    for page in xml.xpath('//pb'):
+        rename_n_attribute(page, 'page')
+        division = False
+        for sibling in page.itersiblings():
+            if sibling.tag == 'pb':
+                break
+            for descendant in sibling.iterdescendants():
+                if descendant.tag == 'pb':
+                    break
+                if descendant.tag == 'div':
+                    division = True
+            page.append(sibling)
+        page.tag = 'div' if division else 'part'
+
+    return xml
+
+
+def release(element: Any) -> None:
+    """
+    Frees an element which has been read, and its preceding siblings. The
+    element itself can't be removed from its parent while it is parsed.
+    """
+    element.clear(keep_tail=True)
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+class TeiDocument:
+    """
+    A <TEI> document which is being read. The attributes are available
+    immediately, the divisions are read while iterating them.
+    """
+
+    def __init__(self, parser: 'TeiParser', element: Any, events: Iterator[Event]) -> None:
+        self.parser = parser
+        self.events = events
+        # depth within the document
+        self.depth = 0
+        self.done = False
+        # the element is cleared once the document has been read
+        attributes = dict(element.attrib)
+
+        # the header precedes the text of the document
+        headers = cast(List[Any], [])
+        for (event, child) in self.__children():
+            if event == 'start':
+                if child.tag in division_tags:
+                    break
+            else:
+                if child.tag == header_tag:
+                    headers.append(deepcopy(child))
+                release(child)
+
+        self.header = parser.transform(attributes, headers)
+
+    @property
+    def attributes(self) -> Iterable[Any]:
+        return self.header.attributes
+
+    @property
+    def divisions(self) -> Iterator[Any]:
+        """
+        The divisions of the document, in document order. Each division
+        is only read when it is needed.
+        """
+        # stray text in the header
+        yield from self.header.divisions
+
+        # transforming has some overhead: do this for multiple texts at once
+        texts = cast(List[Any], [])
+        for (event, child) in self.__children():
+            if event == 'end':
+                if child.tag in division_tags:
+                    texts.append(deepcopy(child))
+                release(child)
+                if len(texts) >= TRANSFORM_SIZE:
+                    yield from self.parser.transform({}, texts).divisions
+                    texts = []
+        if texts:
+            yield from self.parser.transform({}, texts).divisions
+
+    def skip(self) -> None:
+        """
+        Reads the rest of the document (if the divisions haven't been read).
+        """
+        for (event, child) in self.__children():
+            if event == 'end':
+                release(child)
+
+    def __children(self) -> Iterator[Event]:
+        """
+        The start and end of each direct child of the document, until
+        the document ends.
+        """
+        if self.done:
+            return
+        for (event, element) in self.events:
+            if event == 'start':
+                self.depth += 1
+                if self.depth == 1:
+                    yield (event, element)
+            else:
+                self.depth -= 1
+                if self.depth == 0:
+                    yield (event, element)
+                elif self.depth < 0:
+                    # end of the document itself
+                    self.done = True
+                    release(element)
+                    return
+
+
+class TeiParser:
+    """
+    Reads the documents from a TEI file one at a time.
+    """
+
+    def __init__(self) -> None:
+        from lxml import etree
+        import tei_reader
+
+        xslt = etree.parse(path.join(path.dirname(tei_reader.__file__),
+                                     "transform", "tei-transform.xsl"))
+        self.__transform = etree.XSLT(xslt)
+
+    def read(self, lines: Iterable[str]) -> Iterator[TeiDocument]:
+        """Reads the documents of a TEI file: the <TEI> root or each <TEI>
+        in a <teiCorpus>. A document should be read completely, before
+        reading the next one.
+
+        Arguments:
+            lines {Iterable[str]} -- The lines of the file
+
+        Returns:
+            Iterator[TeiDocument] -- The documents
+        """
+        events = self.__events(lines)
+        for (event, element) in events:
+            if event == 'start' and element.tag in document_tags:
+                document = TeiDocument(self, element, events)
+                yield document
+                document.skip()
+
+    def transform(self, attributes: Any, children: List[Any]) -> Any:
+        """
+        Transforms the children of a document (e.g. its header or one of
+        its texts) to a document containing divisions, parts and attributes.
+        """
+        from lxml import etree
+        from tei_reader.models import Document
+
+        root = etree.Element('TEI', attributes)
+        root.extend(children)
+        transformed = assign_beginnings(self.__transform(root).getroot())
+        return Document(transformed.find('document'), None)
+
+    def __events(self, lines: Iterable[str]) -> Iterator[Event]:
+        from lxml import etree
+
+        # recover from errors such as undefined entities or prefixes,
+        # for which tei_reader falls back to BeautifulSoup
+        parser = etree.XMLPullParser(
+            events=('start', 'end'), recover=True, huge_tree=True)
+        batch = cast(List[str], [])
+        size = 0
+        for line in lines:
+            cleaned = clean_line(line)
+            batch.append(cleaned)
+            size += len(cleaned)
+            if size >= FEED_SIZE:
+                parser.feed(''.join(batch).encode('utf-8'))
+                batch = []
+                size = 0
+                yield from parser.read_events()
+        parser.feed(''.join(batch).encode('utf-8'))
+        parser.close()
+        yield from parser.read_events()
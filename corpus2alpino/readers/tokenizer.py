@@ -1,30 +1,219 @@
 #!/usr/bin/env python3
-from spacy.tokens.span import Span
-from spacy.lang.nl import Dutch
+import re
+from collections import OrderedDict
+from itertools import islice
+from typing import cast, Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+# the tokens of each sentence in a text
+Tokenized = Tuple[Tuple[str, ...], ...]
+
+abbreviations = ['a.d', 'a.s', 'bijv', 'blz', 'bv', 'ca', 'd.m.v', 'd.w.z', 'dhr', 'dr', 'drs',
+                 'e.a', 'e.d', 'enz', 'etc', 'evt', 'i.p.v', 'ing', 'ir', 'jl', 'jr', 'm.b.t',
+                 'mevr', 'mr', 'mw', 'n.a.v', 'nl', 'nr', 'o.a', 'o.m', 'p', 'prof', 'resp',
+                 'sr', 'st', 't.a.v', 'tel', 'vs', 'z.g', 'zgn']
+token_pattern = re.compile(r"""
+    https?://\S+[^\s.,;:!?)\]"'] |         # url
+    [\w.+-]+@\w+(?:[.-]\w+)*\.\w+ |       # e-mail address
+    (?:www\.)?\w+(?:[.-]\w+)*\.(?:nl|be|com|org|net|eu)\b |  # domain name
+    (?i:{0})\.(?!\w) |                    # abbreviation
+    (?:[^\W\d_]\.){{2,}} |                  # initialisms (e.g. a.s.r.)
+    \d+(?:[.,:/-]\d+)* |                   # numbers, times and dates
+    ['’](?:s|t|n)\b |                       # 's avonds, 't, 'n
+    \w+(?:[-'’]\w+)* |                     # words (e.g. zee-egel, z'n)
+    [.!?]{{2,}}|[^\w\s]                   # punctuation
+    """.format('|'.join(re.escape(abbreviation) for abbreviation in sorted(abbreviations, key=len, reverse=True))),
+    re.VERBOSE)
+sentence_end = re.compile(r'^[.!?]+$')
+sentence_start = re.compile(r'^[^\W_a-z]|^[\d"\'‘“(\[]')
+closing = re.compile(r'^["\'’”)\]]$')
+
+
+# minimum number of characters in a batch for tokenizing it using multiple
+# processes: passing the texts to other processes has overhead
+PARALLEL_CHARACTERS = 100000
+
+# the spaCy pipeline of a worker process
+worker_nlp = cast(Any, None)
+
+
+def load_nlp() -> Any:
+    from spacy.lang.nl import Dutch
+    nlp = Dutch()
+    nlp.add_pipe("sentencizer")
+    return nlp
+
+
+def split_doc(doc: Any) -> Tokenized:
+    return tuple(tuple(token.text for token in sentence)
+                 for sentence in doc.sents)
+
+
+def init_worker() -> None:
+    global worker_nlp
+    worker_nlp = load_nlp()
+
+
+def split_texts(texts: List[str]) -> List[Tokenized]:
+    """
+    Tokenizes texts in a worker process.
+    """
+    return [split_doc(doc) for doc in worker_nlp.pipe(texts)]
 
 
 class Sentence:
-    def __init__(self, span: Span):
-        self.span = span
+    def __init__(self, tokens: Sequence[str]):
+        self.__tokens = tokens
 
     def tokens(self):
-        for token in self.span:
-            yield token.text
+        yield from self.__tokens
 
     def text(self) -> str:
-        return ' '.join(self.tokens())
+        return ' '.join(self.__tokens)
 
 
 class Tokenizer:
-    def __init__(self):
-        self.nlp = Dutch()
-        self.nlp.add_pipe("sentencizer")
+    def __init__(self, batch_size: int = 1000, n_process: int = 1, memo_characters: int = 10000000):
+        """Splits text into sentences and tokens using spaCy, which is
+        only loaded when it is needed.
+
+        Arguments:
+            batch_size {int} -- Number of texts to pass to spaCy at once
+            n_process {int} -- Number of processes to use for tokenizing large batches,
+            these are started once and used for all the following batches
+            memo_characters {int} -- Total number of characters of the tokenized texts to remember
+        """
+        self.__nlp = cast(Any, None)
+        self.__pool = cast(Any, None)
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self.memo_characters = memo_characters
+        self.memo = cast(Dict[str, Tokenized], OrderedDict())
+        # number of characters in the memo
+        self.memo_size = 0
+
+    @property
+    def nlp(self) -> Any:
+        if self.__nlp is None:
+            self.__nlp = load_nlp()
+        return self.__nlp
+
+    @property
+    def pool(self) -> Any:
+        """
+        The worker processes, these load spaCy when they are started.
+        """
+        if self.__pool is None:
+            from multiprocessing import Pool
+            self.__pool = Pool(self.n_process, init_worker)
+        return self.__pool
+
+    def close(self) -> None:
+        """
+        Stops the worker processes (if these were started).
+        """
+        if self.__pool is not None:
+            self.__pool.close()
+            self.__pool.join()
+            self.__pool = None
+
+    def process(self, text: str) -> List[Sentence]:
+        """Tokenizes a single text; use process_all for tokenizing
+        multiple texts.
+        """
+        return next(self.process_all([text]))
+
+    def process_all(self, texts: Iterable[str]) -> Iterator[List[Sentence]]:
+        """Tokenizes the texts in batches
+
+        Arguments:
+            texts {Iterable[str]} -- The texts (e.g. all the lines of a document)
+
+        Returns:
+            Iterator[List[Sentence]] -- The sentences of each text, in the same order
+        """
+        iterator = iter(texts)
+        while True:
+            batch = list(islice(iterator, self.batch_size))
+            if not batch:
+                return
+            tokenized = self.__tokenize(batch)
+            for text in batch:
+                yield [Sentence(tokens) for tokens in tokenized[text]]
+
+    def __tokenize(self, batch: List[str]) -> Dict[str, Tokenized]:
+        tokenized = cast(Dict[str, Tokenized], {})
+        for text in batch:
+            if text not in tokenized and text in self.memo:
+                tokenized[text] = self.memo[text]
+                cast(OrderedDict, self.memo).move_to_end(text)
+
+        unknown = list(dict.fromkeys(
+            text for text in batch if text not in tokenized))
+        for text, sentences in zip(unknown, self.split(unknown)):
+            tokenized[text] = sentences
+            self.__remember(text, sentences)
+
+        return tokenized
+
+    def split(self, texts: List[str]) -> Iterable[Tokenized]:
+        """Splits each text into sentences and tokens
+
+        Arguments:
+            texts {List[str]} -- The texts to split, these are not in the memo
+
+        Returns:
+            Iterable[Tokenized] -- The tokens of the sentences of each text
+        """
+        if self.n_process > 1 and sum(len(text) for text in texts) >= PARALLEL_CHARACTERS:
+            # divide the batch over the workers
+            size = -(-len(texts) // self.n_process)
+            for tokenized in self.pool.imap(split_texts, [texts[i:i + size] for i in range(0, len(texts), size)]):
+                yield from tokenized
+        else:
+            for doc in self.nlp.pipe(texts, batch_size=self.batch_size):
+                yield split_doc(doc)
+
+    def __remember(self, text: str, tokenized: Tokenized) -> None:
+        # the texts can be long (e.g. a division of a TEI document)
+        if len(text) > self.memo_characters:
+            return
+        self.memo[text] = tokenized
+        self.memo_size += len(text)
+        while self.memo_size > self.memo_characters:
+            (forgotten, _) = cast(OrderedDict, self.memo).popitem(last=False)
+            self.memo_size -= len(forgotten)
+
+
+class RuleTokenizer(Tokenizer):
+    """
+    Splits Dutch text into sentences and tokens using regular expressions.
+    This is much faster than spaCy and works well on text which is
+    (mostly) split into sentences already.
+    """
 
-    def process(self, text: str):
-        self.doc = self.nlp(text)
+    def __init__(self, batch_size: int = 1000, memo_characters: int = 10000000):
+        super().__init__(batch_size, 1, memo_characters)
 
-        return self.sentences()
+    def split(self, texts: List[str]) -> Iterable[Tokenized]:
+        for text in texts:
+            yield self.split_text(text)
 
-    def sentences(self):
-        for sentence in self.doc.sents:
-            yield Sentence(sentence)
+    def split_text(self, text: str) -> Tokenized:
+        sentences = cast(List[Tuple[str, ...]], [])
+        tokens = token_pattern.findall(text)
+        start = 0
+        for i, token in enumerate(tokens):
+            if i + 1 < len(tokens) and sentence_end.match(token) and \
+                    not sentence_end.match(tokens[i + 1]) and \
+                    not closing.match(tokens[i + 1]) and \
+                    sentence_start.match(tokens[i + 1]):
+                sentences.append(tuple(tokens[start:i + 1]))
+                start = i + 1
+            elif closing.match(token) and i > start and sentence_end.match(tokens[i - 1]) and \
+                    i + 1 < len(tokens) and sentence_start.match(tokens[i + 1]):
+                # closing quote or bracket after the end of a sentence
+                sentences.append(tuple(tokens[start:i + 1]))
+                start = i + 1
+        if start < len(tokens):
+            sentences.append(tuple(tokens[start:]))
+        return tuple(sentences)
@@ -2,21 +2,29 @@
 from corpus2alpino.abstracts import Target
 from corpus2alpino.models import Document
 
+import os
 from os import path, makedirs
 from pathlib import Path
-from typing import Optional, cast
+from typing import Any, Dict, List, Optional, cast
+
+# files are written using this suffix until they are complete
+PART_SUFFIX = '.part'
 
 
 class FilesystemTarget(Target):
     """
-    Output chunks to a file using newline separators.
+    Output chunks to a file using newline separators. Files are written
+    under a temporary name and renamed once they are complete: separate
+    files after writing their document, a single file after the conversion.
     """
 
     __current_output_path = None
 
     def __open_file(self, document: Document, filename: Optional[str] = None, suffix: Optional[str] = None):
         if self.merge_files:
-            # when merge_files = True, a file is already open
+            # when merge_files = True, a single file is used
+            if not self.file:  # type: ignore
+                self.__open_merged('w')
             return
 
         output_path = path.join(
@@ -33,9 +41,8 @@ class FilesystemTarget(Target):
         if suffix != None:
             output_path = str(Path(output_path).with_suffix(cast(str, suffix)))
 
-        # always open a new file when splitting in separate files
-        self.__current_output_path = None
-
+        # a document is written to a new file, which is kept open
+        # while the document writes to the same path
         if self.__current_output_path != output_path:
             if self.file:  # type: ignore
                 self.file.close()  # type: ignore
@@ -51,24 +58,28 @@ class FilesystemTarget(Target):
             if attempts > 0:
                 prefix = f"{attempts}-"
 
-            target = Path(path.join(directory, prefix + filename))
-            if not target.is_file():
+            target = path.join(directory, prefix + filename)
+            # the files of the current document are renamed once it is complete
+            if not path.isfile(target) and target not in self.pending:
                 # new file!
-                return target.open("w", encoding="utf-8")
+                self.pending[target] = target + PART_SUFFIX
+                return open(self.pending[target], "w", encoding="utf-8")
             attempts += 1
 
+    def __open_merged(self, mode: str) -> None:
+        output_dir = path.dirname(self.output_path)
+        if output_dir != "":
+            makedirs(output_dir, exist_ok=True)
+        self.file = open(self.output_path + PART_SUFFIX, mode, encoding='utf-8')
+
     def __init__(self, output_path: str, merge_files=False) -> None:
         self.output_path = output_path
         self.index = 1
         self.merge_files = merge_files
-        if self.merge_files:
-            # using a single file
-            output_dir = path.dirname(output_path)
-            if output_dir != "":
-                makedirs(output_dir, exist_ok=True)
-            self.file = open(output_path, 'w', encoding='utf-8')
-        else:
-            self.file = None  # type: ignore
+        # the files of the current document and their temporary names
+        self.pending = cast(Dict[str, str], {})
+        self.written = cast(List[str], [])
+        self.file = cast(Any, None)
 
     def write(
         self,
@@ -82,11 +93,54 @@ class FilesystemTarget(Target):
             self.file.write(content)
 
     def flush(self):
-        return
+        """
+        The document has been written: its files are complete.
+        """
+        if self.merge_files:
+            return
+        if self.file:
+            self.file.close()
+            self.file = None
+        self.__current_output_path = None
+        for (output_path, part_path) in self.pending.items():
+            os.replace(part_path, output_path)
+        self.written.extend(self.pending)
+        self.pending = {}
+
+    def outputs(self) -> List[str]:
+        outputs = self.written
+        self.written = []
+        return outputs
+
+    def checkpoint(self) -> Any:
+        if self.merge_files and self.file:
+            self.file.flush()
+            return self.file.tell()
+        return None
+
+    def resume(self, checkpoint: Any) -> None:
+        if self.merge_files and checkpoint is not None:
+            # discard the incomplete document
+            self.__open_merged('r+')
+            self.file.seek(checkpoint)
+            self.file.truncate()
+
+    def abort(self):
+        # the .part files are left: these are completed (or written
+        # again) when resuming
+        if self.file:
+            self.file.close()
+            self.file = None
+        self.pending = {}
 
     def close(self):
         """
         Release resources.
         """
-        if self.file:
+        self.flush()
+        if self.merge_files:
+            if not self.file:
+                # nothing has been written
+                self.__open_merged('w')
             self.file.close()
+            os.replace(self.output_path + PART_SUFFIX, self.output_path)
@@ -3,22 +3,30 @@ from typing import Dict
 
 import re
 import logging
-from xml.sax.saxutils import escape
+from lxml import etree
 
 from corpus2alpino.annotators.alpino import ANNOTATION_KEY
 from corpus2alpino.abstracts import Writer, Target
 from corpus2alpino.models import Document, MetadataValue, Utterance
 
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>'
+xml_header = re.compile(r'^\s*<\?xml[^>]*\?>\s*')
+# control characters which are not allowed in XML
+invalid_characters = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
 
 class LassyWriter(Writer):
     def __init__(self, merge_treebanks: bool) -> None:
         self.merge_treebanks = merge_treebanks
 
+    def configuration(self) -> str:
+        return 'LassyWriter merge_treebanks={0}'.format(self.merge_treebanks)
+
     def write(self, document: Document, target: Target):
         if self.merge_treebanks:
             target.write(
                 document,
-                "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<treebank>")
+                XML_HEADER + "\n<treebank>")
 
             for utterance in document.utterances:
                 self.write_utterance(document, target, utterance)
@@ -33,68 +41,72 @@ class LassyWriter(Writer):
                 index += 1
 
     def write_utterance(self, document: Document, target: Target, utterance: Utterance, filename=None):
-        try:
-            annotation = utterance.annotations[ANNOTATION_KEY]
-        except KeyError:
+        if not ANNOTATION_KEY in utterance.annotations:
             logging.getLogger().warning(
                 'Annotation missing for: {0}|{1} ({2})'.format(utterance.id, utterance.text, document.subpath))
             return
 
         target.write(document, self.render_annotation(
-            document, utterance, annotation, not filename), filename)
+            document, utterance, not filename), filename)
 
-    def render_annotation(self, document: Document, utterance: Utterance, annotation: str, remove_header=False) -> str:
+    def render_annotation(self, document: Document, utterance: Utterance, remove_header=False) -> str:
         metadata = {**document.metadata, **utterance.metadata}
+        annotation = utterance.annotations[ANNOTATION_KEY]
 
-        if not metadata and remove_header == False:
-            return annotation
-
-        lines = annotation.splitlines()
-
-        if remove_header:
-            # remove the xml header and remove the trailing newline
-            if '<?xml' in lines[0]:
-                lines = lines[1:]
-            lines[-1] = lines[-1].rstrip()
-
-        existing_metadata = -1
-
-        if metadata:
-            for i in range(0, len(lines)):
-                line = lines[i]
-                if '<metadata' in line:
-                    existing_metadata = i
-                elif existing_metadata >= 0:
-                    meta_name_search = re.search(
-                        '<meta .*name="([^"]+)".*?/>', line)
-                    if meta_name_search:
-                        name = meta_name_search.group(1)
-                        try:
-                            item = metadata[name]
-                            lines[i] = self.render_metadata_value(name, item)
-                            del metadata[name]
-                        except KeyError:
-                            pass
-                    elif '</metadata>' in line:
-                        existing_metadata = i
-                        break
+        if not metadata and isinstance(annotation, str):
+            # nothing to change: no need to parse it
+            return self.render_text(annotation, remove_header)
 
+        try:
+            tree = utterance.get_annotation_tree(ANNOTATION_KEY)
+        except etree.XMLSyntaxError as error:
+            # e.g. a control character which was in the input: the
+            # annotation is written as it is, without the metadata
+            logging.getLogger().warning(
+                'Metadata not added to invalid annotation of: {0}|{1} ({2}/{3}): {4}'.format(
+                    utterance.id, utterance.text, document.collected_file.filename, document.subpath, error))
+            return self.render_text(annotation, remove_header)
         if metadata:
-            lines.insert(existing_metadata, self.render_metadata(
-                metadata, existing_metadata == -1))
-
-        return "\n".join(lines)
+            self.add_metadata(tree, metadata)
 
-    def render_metadata(self, metadata: Dict[str, MetadataValue], wrap: bool) -> str:
-        return ("<metadata>\n" if wrap else "") + "\n".join(
-            self.render_metadata_value(key, item) for (key, item) in metadata.items()
-        ) + ("\n</metadata>" if wrap else "")
-
-    def render_metadata_value(self, key: str, item: MetadataValue) -> str:
-        return '<meta type="{0}" name="{1}" value="{2}" />'.format(item.type, key, self.escape_xml_attribute(item.value))
+        xml = etree.tostring(tree, encoding='unicode', with_tail=False)
+        if remove_header:
+            return xml
+        return XML_HEADER + '\n' + xml
 
-    def escape_xml_attribute(self, value: str) -> str:
-        escaped = escape(value).replace('\n', '&#10;').replace(
-            '\r', '').replace('"', '&quot;')
+    def render_text(self, annotation: str, remove_header=False) -> str:
+        if remove_header:
+            # remove the xml header and remove the trailing newline
+            return xml_header.sub('', annotation, 1).rstrip()
+        return annotation
+
+    def add_metadata(self, tree, metadata: Dict[str, MetadataValue]) -> None:
+        """
+        Adds the metadata to the (Lassy) lxml tree, replacing the
+        existing values.
+        """
+        metadata_element = tree.find('metadata')
+        if metadata_element is None:
+            metadata_element = etree.SubElement(tree, 'metadata')
+            # put it on a separate line
+            if len(tree) > 1:
+                previous = tree[-2]
+                metadata_element.tail = previous.tail
+                previous.tail = '\n'
+            metadata_element.text = '\n'
+
+        existing = {meta.get('name'): meta for meta in metadata_element.iter('meta')}
+        for key, item in metadata.items():
+            try:
+                meta = existing[key]
+                meta.attrib.clear()
+            except KeyError:
+                meta = etree.SubElement(metadata_element, 'meta')
+                meta.tail = '\n'
+            meta.set('type', item.type)
+            meta.set('name', key)
+            meta.set('value', self.clean_xml_attribute(item.value))
+
+    def clean_xml_attribute(self, value: str) -> str:
         # replace CHAT time alignment character with middot because it borks lxml
-        return escaped.replace('\x15', '&#183;')
+        return invalid_characters.sub('', value.replace('\x15', '\u00b7').replace('\r', ''))
@@ -0,0 +1,112 @@
+"""
+Unit test for the Alpino annotator, using a stub parser.
+"""
+
+import time
+import unittest
+from os import path
+from tempfile import TemporaryDirectory
+from threading import Lock
+from typing import List, Optional
+
+from corpus2alpino.annotators.alpino import AlpinoAnnotator
+from corpus2alpino.annotators.alpino_client import AlpinoClient
+from corpus2alpino.annotators.parse_cache import ParseCache
+from corpus2alpino.models import CollectedFile, Document, Utterance
+
+
+class StubClient(AlpinoClient):
+    """
+    Outputs the sentence as the parse and records the parsed sentences.
+    Parsing takes longer for longer sentences.
+    """
+
+    def __init__(self, token_delay: float = 0) -> None:
+        self.token_delay = token_delay
+        self.lock = Lock()
+        self.parsed = []  # type: List[str]
+
+    def parse_line(self, line: str, sentence_id: str, timeout: Optional[float] = None) -> str:
+        with self.lock:
+            self.parsed.append(line)
+        time.sleep(self.token_delay * len(line.split()))
+        return '<?xml version="1.0" encoding="UTF-8"?>\n<alpino_ds version="1.3">\n' + \
+            '  <sentence sentid="{0}">{1}</sentence>\n</alpino_ds>\n'.format(sentence_id, line)
+
+
+class StubAnnotator(AlpinoAnnotator):
+    def __init__(self, client: AlpinoClient, concurrency: int, cache: Optional[ParseCache] = None) -> None:
+        self.stub = client
+        super().__init__('stub', None, concurrency, cache)
+
+    def get_client(self, host_or_path, port_or_args) -> AlpinoClient:
+        return self.stub
+
+
+class CountingCache(ParseCache):
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self.stored = 0
+
+    def put(self, key: str, xml: str) -> None:
+        self.stored += 1
+        super().put(key, xml)
+
+
+class TestAlpino(unittest.TestCase):
+    """
+    Unit test class.
+    """
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def annotate(self, annotator: AlpinoAnnotator, texts: List[str]) -> List[Utterance]:
+        document = Document(CollectedFile('', 'test.txt', '', ''),
+                            [Utterance(text, str(i)) for (i, text) in enumerate(texts)])
+        annotator.annotate(document)
+        return list(document.utterances)
+
+    def test_duplicates(self):
+        """
+        Test that utterances with the same text are only parsed (and cached) once.
+        """
+        texts = ['Dit is een zin .'] * 10 + ['Nog een zin .'] * 2
+        for concurrency in [1, 4]:
+            with self.subTest(concurrency=concurrency):
+                client = StubClient()
+                cache = CountingCache(path.join(self.directory.name, '{0}.db'.format(concurrency)))
+                annotator = StubAnnotator(client, concurrency, cache)
+                utterances = self.annotate(annotator, texts)
+                self.assertEqual(sorted(client.parsed), ['Dit is een zin .', 'Nog een zin .'])
+                self.assertEqual(cache.stored, 2)
+                for (i, utterance) in enumerate(utterances):
+                    self.assertIn('sentid="{0}">{1}<'.format(i, texts[i]),
+                                  utterance.get_annotation_text('alpino'))
+
+                # parsed before
+                self.annotate(annotator, texts)
+                self.assertEqual(len(client.parsed), 2)
+                self.assertEqual(cache.stored, 2)
+                annotator.close()
+
+    def test_order(self):
+        """
+        Test that the utterances keep their order when the longest are parsed first.
+        """
+        lengths = [3, 1, 8, 2, 5, 7, 4, 6]
+        texts = [' '.join(['woord'] * length) for length in lengths]
+        client = StubClient(0.01)
+        annotator = StubAnnotator(client, 2)
+        utterances = self.annotate(annotator, texts)
+        annotator.close()
+
+        self.assertEqual(set(client.parsed[:2]), {texts[2], texts[5]})
+        self.assertEqual([utterance.id for utterance in utterances],
+                         [str(i) for i in range(len(texts))])
+        for (utterance, text) in zip(utterances, texts):
+            self.assertIn('sentid="{0}">{1}<'.format(utterance.id, text),
+                          utterance.get_annotation_text('alpino'))
@@ -0,0 +1,148 @@
+"""
+Unit test for running Alpino as a process, using a fake Alpino.
+"""
+
+import os
+import re
+import stat
+import sys
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from os import path
+from tempfile import TemporaryDirectory
+
+from corpus2alpino.annotators.alpino import AlpinoAnnotator, LengthPolicy
+from corpus2alpino.annotators.alpino_client import AlpinoProcessClient, AlpinoProcessPool, AlpinoTimeout
+from corpus2alpino.annotators.parse_cache import ParseCache
+from corpus2alpino.collectors.filesystem import FilesystemCollector
+from corpus2alpino.converter import Converter
+from corpus2alpino.targets.memory import MemoryTarget
+from corpus2alpino.writers.lassy import LassyWriter
+
+# outputs the sentence as the parse, after loading its "grammar"
+FAKE_ALPINO = """#!{0}
+import sys
+import time
+
+parse_delay = 0.0
+for argument in sys.argv[1:]:
+    if argument.startswith('delay='):
+        time.sleep(float(argument[6:]))
+    if argument.startswith('parse_delay='):
+        parse_delay = float(argument[12:])
+
+for line in sys.stdin:
+    sentence_id, sentence = line.rstrip('\\n').split('|', 1)
+    time.sleep(parse_delay)
+    xml = '<?xml version="1.0" encoding="UTF-8"?>\\n<alpino_ds version="1.3">\\n' + \\
+        '  <sentence sentid="' + sentence_id + '">' + sentence + '</sentence>\\n</alpino_ds>\\n'
+    if sentence == 'geen parse':
+        continue
+    if sentence == 'dubbele parse':
+        sys.stdout.write(xml)
+    sys.stdout.write(xml)
+    sys.stdout.flush()
+"""
+
+
+class TestAlpinoClient(unittest.TestCase):
+    """
+    Unit test class.
+    """
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        os.makedirs(path.join(self.directory.name, 'bin'))
+        with open(path.join(self.directory.name, 'version'), 'w') as version:
+            version.write('fake')
+        self.executable = path.join(self.directory.name, 'bin', 'Alpino')
+        with open(self.executable, 'w') as executable:
+            executable.write(FAKE_ALPINO.format(sys.executable))
+        os.chmod(self.executable, os.stat(self.executable).st_mode | stat.S_IEXEC)
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        self.directory.cleanup()
+
+    def client(self, arguments, read_timeout=10):
+        client = AlpinoProcessClient(self.executable, arguments, read_timeout)
+        self.clients.append(client)
+        return client
+
+    def test_slow_start(self):
+        """
+        Test that loading Alpino doesn't count for the timeout.
+        """
+        client = self.client(['delay=1'])
+        self.assertIn('sentid="1">Dit is een zin',
+                      client.parse_line('Dit is een zin', '1', timeout=0.5))
+        process = client.process
+        self.assertIn('sentid="2">Nog een zin',
+                      client.parse_line('Nog een zin', '2', timeout=0.5))
+        self.assertIs(process, client.process)
+
+    def test_stale_output(self):
+        """
+        Test that each sentence gets its own parse.
+        """
+        client = self.client([], read_timeout=1)
+        self.assertIn('sentid="1"', client.parse_line('dubbele parse', '1'))
+        self.assertIn('sentid="2">Dit is een zin',
+                      client.parse_line('Dit is een zin', '2'))
+
+        # no output at all
+        with self.assertRaises(AlpinoTimeout):
+            client.parse_line('geen parse', '3')
+        self.assertIn('sentid="4">Nog een zin',
+                      client.parse_line('Nog een zin', '4'))
+
+    def test_pool(self):
+        """
+        Test that each sentence gets its own parse when parsing using multiple processes.
+        """
+        pool = AlpinoProcessPool(self.executable, ['parse_delay=0.05'], 3)
+        self.clients.append(pool)
+        with ThreadPoolExecutor(3) as executor:
+            parses = list(executor.map(
+                lambda i: pool.parse_line('Zin nummer {0}'.format(i), str(i)), range(12)))
+        for (i, xml) in enumerate(parses):
+            self.assertIn('sentid="{0}">Zin nummer {0}<'.format(i), xml)
+        processes = set(worker.process.pid for worker in pool.workers if worker.process is not None)
+        self.assertGreater(len(processes), 1)
+
+    def test_annotator_reuse(self):
+        """
+        Test that the annotator can be used for multiple conversions.
+        """
+        cache = ParseCache(path.join(self.directory.name, 'cache.db'))
+        annotator = AlpinoAnnotator(self.executable, [], 2, cache)
+        converter = Converter(
+            FilesystemCollector([path.join(path.dirname(__file__), 'example_chat.cha')]),
+            annotators=[annotator],
+            target=MemoryTarget(),
+            writer=LassyWriter(True))
+        first = list(converter.convert())
+        second = list(converter.convert())
+        self.assertEqual(first, second)
+        self.assertIn('<alpino_ds', first[0])
+
+    def test_settings(self):
+        """
+        Test that only the settings of the parsers with arguments are recorded.
+        """
+        long_client = self.client(['delay=0'])
+        annotator = AlpinoAnnotator(self.executable, [], 1,
+                                    policies=[LengthPolicy(8, long_client)])
+        converter = Converter(
+            FilesystemCollector([path.join(path.dirname(__file__), 'example_chat.cha')]),
+            annotators=[annotator],
+            target=MemoryTarget(),
+            writer=LassyWriter(True))
+        treebank = ''.join(converter.convert())
+        settings = re.findall(r'<meta[^>]*name="alpino_settings"[^>]*>', treebank)
+        # only the long utterances
+        self.assertTrue(0 < len(settings) < treebank.count('<alpino_ds'))
+        for meta in settings:
+            self.assertIn('value="delay=0"', meta)
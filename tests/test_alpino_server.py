@@ -0,0 +1,241 @@
+"""
+Unit test for parsing using Alpino servers, using a fake Alpino server.
+"""
+
+import socket
+import socketserver
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from threading import Lock, Thread
+from typing import cast, List
+
+from corpus2alpino.annotators import alpino_client
+from corpus2alpino.annotators.alpino import AlpinoAnnotator
+from corpus2alpino.annotators.alpino_client import AlpinoServerClient, AlpinoServerPool, AlpinoTimeout
+
+HOST = '127.0.0.1'
+# sentence parsed by the client to check a server
+HEALTH_CHECK = 'hallo wereld !'
+
+
+class FakeAlpinoHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = cast(FakeAlpinoServer, self.server)
+        received = b''
+        while not received.endswith(b'\n\n'):
+            buffer = self.request.recv(1024)
+            if not buffer:
+                break
+            received += buffer
+        sentence_id, sentence = received.decode().strip().split('|', 1)
+
+        with server.lock:
+            server.sentences.append(sentence)
+            server.active += 1
+            server.max_active = max(server.active, server.max_active)
+        time.sleep(server.delay)
+        xml = server.parse(sentence_id, sentence).encode()
+        with server.lock:
+            server.active -= 1
+
+        # the response can arrive in parts
+        for start in range(0, len(xml), server.chunk_size):
+            self.request.sendall(xml[start:start + server.chunk_size])
+            time.sleep(server.chunk_delay)
+
+
+class FakeAlpinoServer(socketserver.ThreadingTCPServer):
+    """
+    Outputs the sentence as the parse, the server closes the connection
+    after each parse (like Alpino does).
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port: int = 0, delay: float = 0, chunk_size: int = 1 << 20, chunk_delay: float = 0,
+                 padding: int = 0) -> None:
+        super().__init__((HOST, port), FakeAlpinoHandler)
+        self.delay = delay
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.padding = padding
+        self.lock = Lock()
+        self.sentences = []  # type: List[str]
+        self.active = 0
+        self.max_active = 0
+        Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def parse(self, sentence_id: str, sentence: str) -> str:
+        return '<?xml version="1.0" encoding="UTF-8"?>\n<alpino_ds version="1.3">\n' + \
+            '  <!--{0}-->\n'.format('x' * self.padding) + \
+            '  <sentence sentid="{0}">{1}</sentence>\n</alpino_ds>\n'.format(sentence_id, sentence)
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class TestAlpinoServer(unittest.TestCase):
+    """
+    Unit test class.
+    """
+
+    def setUp(self):
+        self.servers = []  # type: List[FakeAlpinoServer]
+
+    def tearDown(self):
+        for server in self.servers:
+            server.stop()
+
+    def server(self, **kwargs) -> FakeAlpinoServer:
+        server = FakeAlpinoServer(**kwargs)
+        self.servers.append(server)
+        return server
+
+    def test_framing(self):
+        """
+        Test that a parse which is received in parts is complete.
+        """
+        server = self.server(chunk_size=1000, chunk_delay=0.001, padding=20000)
+        client = AlpinoServerClient(HOST, server.port)
+        self.assertEqual(client.parse_line('Dit is een zin .', '1', 5),
+                         server.parse('1', 'Dit is een zin .'))
+        # the closing punctuation is separated
+        self.assertEqual(client.parse_line('Dit is een zin.', '2'),
+                         server.parse('2', 'Dit is een zin .'))
+
+    def test_max_connections(self):
+        """
+        Test that no more than the maximum number of sentences is sent
+        to the server at the same time.
+        """
+        server = self.server(delay=0.1)
+        client = AlpinoServerClient(HOST, server.port, 2)
+        with ThreadPoolExecutor(6) as executor:
+            parses = list(executor.map(
+                lambda i: client.parse_line('Zin nummer {0} .'.format(i), str(i)), range(6)))
+        for i, xml in enumerate(parses):
+            self.assertIn('sentid="{0}">Zin nummer {0} .<'.format(i), xml)
+        self.assertEqual(server.max_active, 2)
+
+    def test_pool_fastest(self):
+        """
+        Test that the sentences are sent to the fastest server.
+        """
+        slow = self.server(delay=0.2)
+        fast = self.server()
+        pool = AlpinoServerPool([(HOST, slow.port), (HOST, fast.port)])
+        for i in range(5):
+            self.assertIn('sentid="{0}"'.format(i), pool.parse_line('Dit is een zin .', str(i)))
+        self.assertEqual(slow.sentences, [HEALTH_CHECK])
+        self.assertEqual(fast.sentences, [HEALTH_CHECK] + ['Dit is een zin .'] * 5)
+
+    def test_pool_least_loaded(self):
+        """
+        Test that a sentence is sent to a server which isn't busy.
+        """
+        servers = [self.server(delay=0.2), self.server(delay=0.2)]
+        pool = AlpinoServerPool([(HOST, server.port) for server in servers])
+        with ThreadPoolExecutor(2) as executor:
+            list(executor.map(
+                lambda i: pool.parse_line('Zin nummer {0} .'.format(i), str(i)), range(2)))
+        for server in servers:
+            self.assertEqual(len(server.sentences), 2)
+            self.assertEqual(server.max_active, 1)
+
+    def test_pool_recover(self):
+        """
+        Test that an unavailable server is used again once it is available.
+        """
+        available = self.server()
+        with socket.socket() as unused:
+            unused.bind((HOST, 0))
+            port = unused.getsockname()[1]
+        with self.assertLogs(level='WARNING'):
+            pool = AlpinoServerPool([(HOST, available.port), (HOST, port)], retry_interval=0.5)
+        self.assertFalse(pool.servers[1].available)
+
+        recovered = self.server(port=port)
+        # the server is only checked again after the retry interval
+        pool.parse_line('Dit is een zin .', '1')
+        self.assertEqual(recovered.sentences, [])
+        self.assertFalse(pool.servers[1].available)
+
+        time.sleep(pool.servers[1].retry_at - time.monotonic())
+        with self.assertLogs(level='INFO') as logs:
+            pool.parse_line('Dit is een zin .', '2')
+        self.assertIn('is available', logs.output[0])
+        self.assertEqual(recovered.sentences[0], HEALTH_CHECK)
+        self.assertTrue(pool.servers[1].available)
+
+    def test_pool_connect_timeout(self):
+        """
+        Test that a server which cannot be reached in time is skipped.
+        """
+        servers = [self.server(), self.server()]
+        pool = AlpinoServerPool([(HOST, server.port) for server in servers])
+        # prefer the first server
+        pool.servers[1].latency = 1.0
+        create_connection = socket.create_connection
+
+        def connect(address, *args):
+            if address[1] == servers[0].port:
+                raise socket.timeout('timed out')
+            return create_connection(address, *args)
+
+        with mock.patch.object(alpino_client.socket, 'create_connection', connect), \
+                self.assertLogs(level='WARNING'):
+            self.assertIn('sentid="1"', pool.parse_line('Dit is een zin .', '1', 5))
+        self.assertFalse(pool.servers[0].available)
+        self.assertTrue(pool.servers[1].available)
+        self.assertEqual(servers[1].sentences[-1], 'Dit is een zin .')
+
+    def test_pool_deadline(self):
+        """
+        Test that passing the deadline while receiving a parse is a timeout
+        of the sentence: the server remains available.
+        """
+        servers = [self.server(chunk_size=100, chunk_delay=0.1) for _ in range(2)]
+        pool = AlpinoServerPool([(HOST, server.port) for server in servers])
+        monotonic = time.monotonic
+        recv = socket.socket.recv
+        ports = [server.port for server in servers]
+        received = []
+
+        def clock():
+            # the deadline passes once a part of the parse has been received
+            return monotonic() + (100 if received else 0)
+
+        def receive(connection, *args):
+            buffer = recv(connection, *args)
+            if connection.getpeername()[1] in ports:
+                received.append(buffer)
+            return buffer
+
+        with mock.patch.object(alpino_client, 'monotonic', clock), \
+                mock.patch.object(socket.socket, 'recv', receive):
+            with self.assertRaises(AlpinoTimeout):
+                pool.parse_line('Dit is een zin .', '1', 5)
+        self.assertEqual(len(received), 1)
+        self.assertTrue(all(server.available for server in pool.servers))
+
+    def test_configuration(self):
+        """
+        Test that the configuration doesn't depend on the servers used.
+        """
+        servers = [self.server() for _ in range(3)]
+        annotators = [
+            AlpinoAnnotator(HOST, servers[0].port),
+            AlpinoAnnotator(HOST, servers[1].port),
+            AlpinoAnnotator([(HOST, server.port) for server in servers[1:]])]
+        configurations = [annotator.configuration() for annotator in annotators]
+        for annotator in annotators:
+            annotator.close()
+        self.assertEqual(len(set(configurations)), 1)
+        self.assertNotIn(str(servers[0].port), configurations[0])
@@ -0,0 +1,124 @@
+"""
+Unit test for collecting the files in archives.
+"""
+
+import io
+import os
+import tarfile
+import unittest
+import zipfile
+from os import path
+from tempfile import TemporaryDirectory
+
+from corpus2alpino.collectors.archive import ArchiveCollector
+from corpus2alpino.collectors.filesystem import FilesystemCollector
+from corpus2alpino.converter import Converter
+from corpus2alpino.targets.filesystem import FilesystemTarget
+from corpus2alpino.targets.memory import MemoryTarget
+from corpus2alpino.writers.paqu import PaQuWriter
+
+
+class TestArchive(unittest.TestCase):
+    """
+    Unit test class.
+    """
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.files = [path.join(path.dirname(__file__), filename)
+                      for filename in ['example_chat.cha', 'example_folia.xml', 'example_tei.xml']]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_archives(self):
+        """
+        Test that the members of archives are read like the files themselves.
+        """
+        expected = self.convert(FilesystemCollector(self.files))
+
+        zip_path = path.join(self.directory.name, 'corpus.zip')
+        with zipfile.ZipFile(zip_path, 'w') as archive:
+            for filename in self.files:
+                archive.write(filename, 'corpus/' + path.basename(filename))
+        archives = [zip_path]
+
+        for mode, extension in [('w', '.tar'), ('w:gz', '.tar.gz'), ('w:xz', '.tar.xz')]:
+            tar_path = path.join(self.directory.name, 'corpus' + extension)
+            with tarfile.open(tar_path, mode) as archive:
+                for filename in self.files:
+                    archive.add(filename, 'corpus/' + path.basename(filename))
+            archives.append(tar_path)
+
+        for archive_path in archives:
+            collector = ArchiveCollector([archive_path])
+            self.assertEqual(
+                [(file.relpath, file.filename) for file in collector.read()],
+                [('corpus', path.basename(filename)) for filename in self.files])
+            self.assertEqual(collector.position, 3)
+            self.assertEqual(collector.total, 3)
+            self.assertEqual(self.convert(ArchiveCollector([archive_path])), expected)
+
+    def test_outside(self):
+        """
+        Test that members with a path outside of the archive are skipped.
+        """
+        content = b'Dit is een zin.'
+        names = ['corpus/a.txt', '../b.txt', 'corpus/../../c.txt', '/d.txt', 'corpus/./e/../f.txt']
+        zip_path = path.join(self.directory.name, 'corpus.zip')
+        with zipfile.ZipFile(zip_path, 'w') as archive:
+            for name in names:
+                archive.writestr(zipfile.ZipInfo(name), content)
+        tar_path = path.join(self.directory.name, 'corpus.tar')
+        with tarfile.open(tar_path, 'w') as archive:
+            for name in names:
+                info = tarfile.TarInfo(name)
+                info.size = len(content)
+                archive.addfile(info, io.BytesIO(content))
+
+        for archive_path in [zip_path, tar_path]:
+            collector = ArchiveCollector([archive_path])
+            with self.assertLogs(level='WARNING') as logs:
+                self.assertEqual(
+                    [(file.relpath, file.filename) for file in collector.read()],
+                    [('corpus', 'a.txt'), ('corpus', 'f.txt')])
+            self.assertEqual(len(logs.output), 3)
+            self.assertEqual(collector.total, 2)
+
+    def test_multiple(self):
+        """
+        Test that the members of multiple archives are kept apart.
+        """
+        archives = []
+        for name in ['een', 'twee']:
+            archive_path = path.join(self.directory.name, 'archives', name, 'corpus.zip')
+            os.makedirs(path.dirname(archive_path))
+            with zipfile.ZipFile(archive_path, 'w') as archive:
+                archive.write(self.files[0], 'corpus/' + path.basename(self.files[0]))
+            archives.append(archive_path)
+        tar_path = path.join(self.directory.name, 'archives', 'drie.tar.gz')
+        with tarfile.open(tar_path, 'w:gz') as archive:
+            archive.add(self.files[0], 'corpus/' + path.basename(self.files[0]))
+        archives.append(tar_path)
+
+        filename = path.basename(self.files[0])
+        self.assertEqual(
+            [(file.relpath, file.filename) for file in ArchiveCollector(archives).read()],
+            [('een/corpus/corpus', filename),
+             ('twee/corpus/corpus', filename),
+             ('drie/corpus', filename)])
+
+        output = path.join(self.directory.name, 'output')
+        converter = Converter(ArchiveCollector(archives),
+                              target=FilesystemTarget(output),
+                              writer=PaQuWriter())
+        self.assertEqual(len(list(converter.convert())), 3)
+        self.assertEqual(
+            sorted(path.relpath(path.join(directory, name), output)
+                   for (directory, _, names) in os.walk(output) for name in names),
+            [path.join(prefix, 'corpus', path.splitext(filename)[0] + '.txt')
+             for prefix in ['drie', path.join('een', 'corpus'), path.join('twee', 'corpus')]])
+
+    def convert(self, collector):
+        converter = Converter(collector, target=MemoryTarget(), writer=PaQuWriter())
+        return list(converter.convert())
@@ -5,10 +5,14 @@ Unit test for corpus to Alpino converter.
 import glob
 import unittest
 from typing import Sequence
+from io import BytesIO
 from os import path
 
+from corpus2alpino.abstracts import Annotator
 from corpus2alpino.converter import Converter
 from corpus2alpino.collectors.filesystem import FilesystemCollector
+from corpus2alpino.models import CollectedFile
+from corpus2alpino.readers.auto import AutoReader
 from corpus2alpino.targets.memory import MemoryTarget
 from corpus2alpino.writers.paqu import PaQuWriter
 
@@ -43,5 +47,56 @@ class TestCorpus2Alpino(unittest.TestCase):
                     output,
                     expected_file.read())
 
+    def test_skip_unknown(self):
+        """
+        Test that files in an unknown format are skipped without reading them entirely.
+        """
+        def fail():
+            raise AssertionError("content read")
+
+        reader = AutoReader()
+        for filename, prefix, expected in [
+                ('image.jpg', b'\x89PNG', ''),
+                ('data.xml', b'<?xml version="1.0"?><data>', '<?xml version="1.0"?><data>' + 'x' * 373)]:
+            file = CollectedFile('', filename, '', open=lambda: BytesIO(prefix + b'x' * 1000))
+            self.assertEqual(list(reader.read(file)), [])
+            self.assertEqual(file.prefix, expected)
+
+        self.assertEqual(reader.test_file(CollectedFile('', 'test.cha', '', open=fail)), True)
+
+    def test_close(self):
+        """
+        Test that the annotators are closed, also when the conversion fails.
+        """
+        annotator = ClosingAnnotator()
+        converter = Converter(
+            FilesystemCollector(self.get_files('example*.cha')),
+            annotators=[annotator],
+            target=MemoryTarget(),
+            writer=FailingWriter())
+        with self.assertRaises(ValueError):
+            list(converter.convert())
+        self.assertEqual(annotator.closed, 1)
+
+        converter.writer = PaQuWriter()
+        self.assertEqual(len(list(converter.convert())), 1)
+        self.assertEqual(annotator.closed, 2)
+
     def get_files(self, pattern):
         return sorted(glob.glob(path.join(path.dirname(__file__), pattern)))
+
+
+class ClosingAnnotator(Annotator):
+    def __init__(self):
+        self.closed = 0
+
+    def annotate(self, document):
+        return
+
+    def close(self):
+        self.closed += 1
+
+
+class FailingWriter(PaQuWriter):
+    def write(self, document, target):
+        raise ValueError("write failed")
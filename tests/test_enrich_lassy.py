@@ -6,10 +6,12 @@ import glob
 import unittest
 from typing import Sequence
 from os import path
+from tempfile import TemporaryDirectory
+from lxml import etree
 
 from corpus2alpino.annotators.alpino import ANNOTATION_KEY
 from corpus2alpino.annotators.enrich_lassy import EnrichLassyAnnotator
-from corpus2alpino.models import Utterance
+from corpus2alpino.models import CollectedFile, Document, Utterance
 
 
 class TestEnrichLassy(unittest.TestCase):
@@ -27,6 +29,55 @@ class TestEnrichLassy(unittest.TestCase):
         with open(get_filepath("enrichment_expected.xml")) as expected:
             self.assertEqual(get_enriched(), expected.read())
 
+    def test_first_match(self):
+        """
+        Test that only the first matching row is assigned, regardless of
+        the attributes it matches on.
+        """
+        with TemporaryDirectory() as directory:
+            filepath = path.join(directory, "enrichment.csv")
+            with open(filepath, "w") as enrichment:
+                enrichment.write(
+                    "@pos,@num,penn_pos\nnoun,,NN\nnoun,pl,NNS\n,,X\n")
+            enricher = EnrichLassyAnnotator(filepath)
+
+        self.assertEqual(len(enricher.enrichments), 3)
+        for attributes, expected in [
+                ({"pos": "noun", "num": "pl"}, "NN"),
+                ({"pos": "noun"}, "NN"),
+                ({"pos": "verb", "num": "pl"}, "X")]:
+            node = etree.Element("node", attributes)
+            enricher.find_match(node).assign(node)
+            self.assertEqual(node.attrib["penn_pos"], expected)
+
+    def test_stream(self):
+        """
+        Test that the utterances of a document are enriched while they
+        are read.
+        """
+        read = []
+
+        def read_utterances():
+            with open(get_filepath("example_lassy.xml")) as lassy:
+                xml = lassy.read()
+            for i in range(3):
+                read.append(i)
+                yield Utterance("dit is een test", str(i), {}, i,
+                                {ANNOTATION_KEY: xml})
+
+        enricher = EnrichLassyAnnotator(get_filepath("enrichment.csv"))
+        document = Document(CollectedFile('', 'test.xml', '', ''),
+                            read_utterances())
+        enricher.annotate(document)
+        self.assertEqual(read, [])
+
+        with open(get_filepath("enrichment_expected.xml")) as expected:
+            expected_xml = expected.read()
+        for i, utterance in enumerate(document.utterances):
+            self.assertEqual(read, list(range(i + 1)))
+            self.assertEqual(
+                utterance.get_annotation_text(ANNOTATION_KEY), expected_xml)
+
 
 def get_enriched():
     enricher = EnrichLassyAnnotator(get_filepath("enrichment.csv"))
@@ -41,7 +92,7 @@ def get_enriched():
             })
     enricher.enrich_utterance(utterance)
 
-    return utterance.annotations[ANNOTATION_KEY]
+    return utterance.get_annotation_text(ANNOTATION_KEY)
 
 
 def get_filepath(filename: str) -> str:
@@ -0,0 +1,45 @@
+"""
+Unit test for collecting files from the file system.
+"""
+
+import os
+import unittest
+from os import path
+from tempfile import TemporaryDirectory
+
+from corpus2alpino.collectors.filesystem import FilesystemCollector
+
+
+class TestFilesystem(unittest.TestCase):
+    """
+    Unit test class.
+    """
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        for (relpath, size) in [('a.txt', 3), ('sub/b.txt', 5), ('sub/deeper/c.txt', 7), ('d.txt', 11)]:
+            filename = path.join(self.directory.name, 'corpus', relpath)
+            os.makedirs(path.dirname(filename), exist_ok=True)
+            with open(filename, 'w') as file:
+                file.write('x' * size)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_scan(self):
+        """
+        Test that the files and their sizes are known before reading them.
+        """
+        corpus = path.join(self.directory.name, 'corpus')
+        collector = FilesystemCollector([corpus], threads=2)
+        manifest = collector.scan()
+        self.assertEqual(
+            sorted((entry.relpath, entry.filename, entry.size) for entry in manifest),
+            [('', 'a.txt', 3), ('', 'd.txt', 11), ('sub', 'b.txt', 5), (path.join('sub', 'deeper'), 'c.txt', 7)])
+
+        files = iter(collector.read())
+        first = next(files)
+        self.assertEqual((collector.total, collector.total_bytes), (4, 26))
+        self.assertEqual(first.size, manifest[0].size)
+        self.assertEqual(len(list(files)), 3)
+        self.assertEqual((collector.position, collector.position_bytes), (4, 26))
@@ -0,0 +1,57 @@
+"""
+Unit test for the FoLiA reader.
+"""
+
+import unittest
+from os import path
+
+from corpus2alpino.models import CollectedFile
+from corpus2alpino.readers.folia import FoliaReader
+from corpus2alpino.targets.memory import MemoryTarget
+from corpus2alpino.writers.paqu import PaQuWriter
+
+
+class TestFolia(unittest.TestCase):
+    """
+    Unit test class.
+    """
+
+    def setUp(self):
+        self.maxDiff = None
+
+    def test_tokenized(self):
+        """
+        Test that tokenized documents are streamed and give the same
+        result as reading them using the FoLiA library.
+        """
+        with open(get_filepath("example_folia2.xml"), encoding="utf-8") as file:
+            content = file.read()
+
+        reader = FoliaReader()
+        self.assertEqual(reader.scan_tokenized(CollectedFile('', 'example_folia2.xml', '', content)),
+                         [('language', 'nld'), ('genre', 'artikel')])
+
+        library_reader = FoliaReader()
+        library_reader.scan_tokenized = lambda collected_file: None
+        self.assertEqual(convert(reader, content), convert(library_reader, content))
+
+    def test_untokenized(self):
+        """
+        Test that documents which need to be tokenized are read using the FoLiA library.
+        """
+        reader = FoliaReader()
+        for filename in ["example_folia.xml", "example_folia3.xml"]:
+            with open(get_filepath(filename), encoding="utf-8") as file:
+                self.assertEqual(reader.scan_tokenized(
+                    CollectedFile('', filename, '', file.read())), None)
+
+
+def convert(reader: FoliaReader, content: str) -> str:
+    target = MemoryTarget()
+    for document in reader.read(CollectedFile('', 'example.xml', '', content)):
+        PaQuWriter().write(document, target)
+    return target.flush()
+
+
+def get_filepath(filename: str) -> str:
+    return path.join(path.dirname(__file__), filename)
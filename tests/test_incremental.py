@@ -0,0 +1,103 @@
+"""
+Unit test for converting only the files which changed.
+"""
+
+import os
+import unittest
+from os import path
+from tempfile import TemporaryDirectory
+
+from corpus2alpino.collectors.filesystem import FilesystemCollector
+from corpus2alpino.converter import Converter
+from corpus2alpino.incremental import ConversionManifest
+from corpus2alpino.readers.auto import AutoReader
+from corpus2alpino.readers.tokenizer import RuleTokenizer
+from corpus2alpino.targets.filesystem import FilesystemTarget
+
+
+class TestIncremental(unittest.TestCase):
+    """
+    Unit test class.
+    """
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.corpus = path.join(self.directory.name, 'corpus')
+        self.output = path.join(self.directory.name, 'output')
+        for name in ['a.txt', 'b.txt', 'c.txt']:
+            self.write(name, 'Dit is {0}.'.format(name))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name: str, text: str) -> None:
+        os.makedirs(self.corpus, exist_ok=True)
+        with open(path.join(self.corpus, name), 'w', encoding='utf-8') as file:
+            file.write(text)
+
+    def convert(self, tokenizer=None, filepaths=None):
+        """
+        Converts the corpus and returns the number of converted documents.
+        """
+        converter = Converter(FilesystemCollector(filepaths or [self.corpus]),
+                              reader=AutoReader(tokenizer or RuleTokenizer()),
+                              target=FilesystemTarget(self.output, False),
+                              manifest=ConversionManifest(path.join(self.output, 'manifest.json')))
+        return len(list(converter.convert()))
+
+    def test_incremental(self):
+        """
+        Test that only the added and changed files are converted again.
+        """
+        self.assertEqual(self.convert(), 3)
+        self.assertEqual(self.convert(), 0)
+
+        self.write('b.txt', 'Dit is veranderd.')
+        self.write('d.txt', 'Dit is nieuw.')
+        self.assertEqual(self.convert(), 2)
+        with open(path.join(self.output, 'b.txt'), encoding='utf-8') as file:
+            self.assertIn('veranderd', file.read())
+
+        # same content
+        self.write('c.txt', 'Dit is c.txt.')
+        self.assertEqual(self.convert(), 0)
+
+        os.remove(path.join(self.corpus, 'a.txt'))
+        self.assertEqual(self.convert(), 0)
+        self.assertEqual(sorted(os.listdir(self.output)),
+                         ['b.txt', 'c.txt', 'd.txt', 'manifest.json'])
+
+        # the output has been removed
+        os.remove(path.join(self.output, 'c.txt'))
+        self.assertEqual(self.convert(), 1)
+
+    def test_subset(self):
+        """
+        Test that converting some of the files keeps the output of the others.
+        """
+        self.assertEqual(self.convert(), 3)
+        self.assertEqual(self.convert(filepaths=[path.join(self.corpus, 'a.txt')]), 0)
+        self.write('b.txt', 'Dit is veranderd.')
+        self.assertEqual(self.convert(filepaths=[path.join(self.corpus, 'b*')]), 1)
+        self.assertEqual(sorted(os.listdir(self.output)),
+                         ['a.txt', 'b.txt', 'c.txt', 'manifest.json'])
+        self.assertEqual(self.convert(), 0)
+
+        os.remove(path.join(self.corpus, 'c.txt'))
+        self.assertEqual(self.convert(filepaths=[path.join(self.corpus, 'a.txt')]), 0)
+        self.assertEqual(sorted(os.listdir(self.output)),
+                         ['a.txt', 'b.txt', 'manifest.json'])
+
+    def test_configuration(self):
+        """
+        Test that all the files are converted again using another configuration.
+        """
+        self.assertEqual(self.convert(), 3)
+        self.assertEqual(self.convert(SentenceTokenizer()), 3)
+        self.assertEqual(self.convert(SentenceTokenizer()), 0)
+        self.assertEqual(sorted(os.listdir(self.output)),
+                         ['a.txt', 'b.txt', 'c.txt', 'manifest.json'])
+
+
+class SentenceTokenizer(RuleTokenizer):
+    pass
@@ -0,0 +1,161 @@
+"""
+Unit test for resuming an interrupted conversion.
+"""
+
+import os
+import unittest
+from os import path
+from tempfile import TemporaryDirectory
+
+from corpus2alpino.annotators.alpino import AlpinoAnnotator
+from corpus2alpino.collectors.filesystem import FilesystemCollector
+from corpus2alpino.converter import Converter
+from corpus2alpino.journal import ConversionJournal
+from corpus2alpino.readers.auto import AutoReader
+from corpus2alpino.readers.tokenizer import RuleTokenizer
+from corpus2alpino.targets.filesystem import FilesystemTarget
+from corpus2alpino.writers.paqu import PaQuWriter
+from tests.test_alpino_server import FakeAlpinoServer, HOST
+
+
+class Interrupted(Exception):
+    pass
+
+
+class InterruptingWriter(PaQuWriter):
+    """
+    Stops the conversion while writing the n-th document.
+    """
+
+    def __init__(self, interrupt_at: int) -> None:
+        self.interrupt_at = interrupt_at
+
+    def write(self, document, target):
+        lines = iter(self.output_utterances(document.utterances, document.metadata))
+        target.write(document, next(lines), suffix='.txt')
+        self.interrupt_at -= 1
+        if self.interrupt_at == 0:
+            raise Interrupted()
+        for line in lines:
+            target.write(document, line, suffix='.txt')
+
+    def configuration(self):
+        return 'PaQuWriter'
+
+
+class TestJournal(unittest.TestCase):
+    """
+    Unit test class.
+    """
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.corpus = path.join(self.directory.name, 'corpus')
+        os.makedirs(self.corpus)
+        for name in ['a.txt', 'b.txt', 'c.txt']:
+            with open(path.join(self.corpus, name), 'w', encoding='utf-8') as file:
+                file.write('Dit is {0}. Nog een zin.'.format(name))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def convert(self, output_path, merge_files, journal_path, writer=None, resume=False, annotators=None):
+        """
+        Converts the corpus and returns the number of converted documents.
+        """
+        converter = Converter(FilesystemCollector([self.corpus]),
+                              annotators=annotators,
+                              reader=AutoReader(RuleTokenizer()),
+                              writer=writer or PaQuWriter(),
+                              target=FilesystemTarget(output_path, merge_files),
+                              journal=ConversionJournal(journal_path, resume))
+        return len(list(converter.convert()))
+
+    def test_resume_files(self):
+        """
+        Test resuming a conversion to separate files.
+        """
+        output = path.join(self.directory.name, 'output')
+        journal = path.join(output, 'journal')
+        with self.assertRaises(Interrupted):
+            self.convert(output, False, journal, InterruptingWriter(2))
+        # the incomplete file is only renamed once it has been written
+        self.assertEqual(sorted(name.split('.')[-1] for name in os.listdir(output)),
+                         ['journal', 'part', 'txt'])
+
+        self.assertEqual(self.convert(output, False, journal, resume=True), 2)
+        self.assertEqual(sorted(os.listdir(output)), ['a.txt', 'b.txt', 'c.txt'])
+        for name in ['a.txt', 'b.txt', 'c.txt']:
+            with open(path.join(output, name), encoding='utf-8') as file:
+                self.assertEqual(file.read(), '0-0|Dit is {0} . txt .\n\n0-1|Nog een zin .\n\n'.format(name[0]))
+
+    def test_resume_merged(self):
+        """
+        Test resuming a conversion to a single file.
+        """
+        output = path.join(self.directory.name, 'output.txt')
+        journal = output + '.journal'
+        self.convert(output, True, journal)
+        with open(output, encoding='utf-8') as file:
+            expected = file.read()
+        os.remove(output)
+
+        with self.assertRaises(Interrupted):
+            self.convert(output, True, journal, InterruptingWriter(3))
+        self.assertFalse(path.exists(output))
+
+        self.assertEqual(self.convert(output, True, journal, resume=True), 1)
+        self.assertFalse(path.exists(journal))
+        with open(output, encoding='utf-8') as file:
+            self.assertEqual(file.read(), expected)
+
+    def test_resume_stopped(self):
+        """
+        Test resuming a conversion which was stopped after writing a document.
+        """
+        output = path.join(self.directory.name, 'output')
+        journal = path.join(output, 'journal')
+        converter = Converter(FilesystemCollector([self.corpus]),
+                              reader=AutoReader(RuleTokenizer()),
+                              writer=PaQuWriter(),
+                              target=FilesystemTarget(output),
+                              journal=ConversionJournal(journal))
+        conversion = converter.convert()
+        next(conversion)
+        conversion.close()
+
+        self.assertEqual(self.convert(output, False, journal, resume=True), 2)
+        self.assertEqual(sorted(os.listdir(output)), ['a.txt', 'b.txt', 'c.txt'])
+
+    def test_resume_servers(self):
+        """
+        Test resuming a conversion using other Alpino servers.
+        """
+        servers = [FakeAlpinoServer() for _ in range(3)]
+        try:
+            output = path.join(self.directory.name, 'output')
+            journal = path.join(output, 'journal')
+            with self.assertRaises(Interrupted):
+                self.convert(output, False, journal, InterruptingWriter(2),
+                             annotators=[AlpinoAnnotator(HOST, servers[0].port)])
+            # e.g. restarted using other ports
+            self.assertEqual(self.convert(output, False, journal, resume=True, annotators=[
+                AlpinoAnnotator([(HOST, server.port) for server in servers[1:]], None, 2)]), 2)
+            self.assertEqual(sorted(os.listdir(output)), ['a.txt', 'b.txt', 'c.txt'])
+        finally:
+            for server in servers:
+                server.stop()
+
+    def test_configuration(self):
+        """
+        Test that a conversion using other settings isn't resumed.
+        """
+        output = path.join(self.directory.name, 'output')
+        journal = path.join(output, 'journal')
+        with self.assertRaises(Interrupted):
+            self.convert(output, False, journal, InterruptingWriter(2))
+        with self.assertRaises(ValueError):
+            converter = Converter(FilesystemCollector([self.corpus]),
+                                  target=FilesystemTarget(output),
+                                  journal=ConversionJournal(journal, True))
+            list(converter.convert())
@@ -0,0 +1,44 @@
+"""
+Unit test for writing Lassy XML.
+"""
+
+import unittest
+
+from corpus2alpino.models import CollectedFile, Document, MetadataValue, Utterance
+from corpus2alpino.targets.memory import MemoryTarget
+from corpus2alpino.writers.lassy import LassyWriter
+
+PARSE = '<?xml version="1.0" encoding="UTF-8"?>\n<alpino_ds version="1.3">\n' + \
+    '  <sentence sentid="{0}">{1}</sentence>\n</alpino_ds>\n'
+
+
+class TestLassyWriter(unittest.TestCase):
+    """
+    Unit test class.
+    """
+
+    def test_invalid_annotation(self):
+        """
+        Test that an annotation which isn't valid XML is written without metadata.
+        """
+        utterances = [Utterance(text, str(i), {'speaker': MetadataValue('A')},
+                                annotations={'alpino': PARSE.format(i, text)})
+                      for (i, text) in enumerate(['Een \x01 zin .', 'Nog een zin .'])]
+        document = Document(CollectedFile('', 'test.txt', '', ''), utterances,
+                            {'title': MetadataValue('Test')})
+
+        for merge_treebanks in [True, False]:
+            with self.subTest(merge_treebanks=merge_treebanks):
+                target = MemoryTarget()
+                with self.assertLogs(level='WARNING') as logs:
+                    LassyWriter(merge_treebanks).write(document, target)
+                self.assertEqual(len(logs.output), 1)
+                self.assertIn('0|Een \x01 zin .', logs.output[0])
+
+                output = target.flush()
+                (invalid, valid) = output.split('</alpino_ds>')[:2]
+                self.assertIn('<sentence sentid="0">Een \x01 zin .</sentence>', invalid)
+                self.assertNotIn('<meta', invalid)
+                self.assertIn('<sentence sentid="1">Nog een zin .</sentence>', valid)
+                self.assertIn('<meta type="text" name="title" value="Test"/>', valid)
+                self.assertIn('<meta type="text" name="speaker" value="A"/>', valid)
@@ -0,0 +1,42 @@
+"""
+Unit test for the models.
+"""
+
+import unittest
+from os import path
+
+from corpus2alpino.models import CollectedFile, MetadataValue
+from corpus2alpino.readers.chat import ChatReader
+
+
+class TestModels(unittest.TestCase):
+    """
+    Unit test class.
+    """
+
+    def test_metadata_value(self):
+        """
+        Test that metadata values are shared and can't be changed.
+        """
+        self.assertIs(MetadataValue("CHI"), MetadataValue("CHI"))
+        self.assertIsNot(MetadataValue("1"), MetadataValue("1", "int"))
+        with self.assertRaises(AttributeError):
+            MetadataValue("CHI").value = "INV"
+
+    def test_metadata_layers(self):
+        """
+        Test that utterances share the metadata of their speaker and
+        document, without changing it.
+        """
+        with open(path.join(path.dirname(__file__), "example_chat.cha"), encoding="utf-8") as file:
+            collected_file = CollectedFile("", "example_chat.cha", "", file.read())
+        document = next(ChatReader().read(collected_file))
+        utterances = list(document.utterances)
+        first = utterances[0].metadata
+        second = utterances[1].metadata
+        self.assertIs(first.maps[1], second.maps[1])
+        self.assertEqual(first["media"], document.metadata["media"])
+
+        first["media"] = MetadataValue("other")
+        self.assertEqual(document.metadata["media"].value, "example, audio")
+        self.assertEqual(second["media"].value, "example, audio")
@@ -0,0 +1,71 @@
+"""
+Unit test for the parse cache.
+"""
+
+import unittest
+import zlib
+from os import path
+from tempfile import TemporaryDirectory
+
+from corpus2alpino.annotators.parse_cache import ParseCache
+
+
+class TestParseCache(unittest.TestCase):
+    """
+    Unit test class.
+    """
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.path = path.join(self.directory.name, 'cache.db')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_key(self):
+        """
+        Test that the key ignores whitespace differences but not the configuration.
+        """
+        cache = ParseCache(self.path)
+        self.assertEqual(cache.key('ja  nee ', '1', ''),
+                         cache.key('ja nee', '1', ''))
+        self.assertNotEqual(cache.key('ja nee', '1', ''),
+                            cache.key('ja nee', '2', ''))
+        self.assertNotEqual(cache.key('ja nee', '1', ''),
+                            cache.key('ja nee', '1', '-veryfast'))
+        cache.close()
+
+    def test_persist(self):
+        """
+        Test that parses are available after reopening the cache.
+        """
+        cache = ParseCache(self.path)
+        key = cache.key('ja', None, '')
+        cache.put(key, '<alpino_ds/>')
+        cache.close()
+
+        cache = ParseCache(self.path)
+        self.assertEqual(cache.get(key), '<alpino_ds/>')
+        self.assertEqual(cache.get(cache.key('nee', None, '')), None)
+        cache.close()
+
+    def test_evict(self):
+        """
+        Test that the least recently used parses are removed.
+        """
+        xml = '<alpino_ds>{0}</alpino_ds>'
+        cache = ParseCache(self.path)
+        size = len(zlib.compress(xml.format(0).encode()))
+        cache.max_size = size * 3
+
+        for i in range(3):
+            cache.put(str(i), xml.format(i))
+        # use the first one: the second should be evicted
+        cache.get('0')
+        cache.put('3', xml.format(3))
+
+        self.assertEqual(cache.get('0'), xml.format(0))
+        self.assertEqual(cache.get('1'), None)
+        self.assertEqual(cache.get('3'), xml.format(3))
+        self.assertLessEqual(cache.size, cache.max_size)
+        cache.close()
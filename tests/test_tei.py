@@ -0,0 +1,79 @@
+"""
+Unit test for the TEI reader.
+"""
+
+import unittest
+
+from corpus2alpino.models import CollectedFile
+from corpus2alpino.readers.auto import AutoReader
+from corpus2alpino.readers.tei import TeiReader, TokenizedSentenceEmitter
+from corpus2alpino.readers.tokenizer import RuleTokenizer
+
+
+class TestTei(unittest.TestCase):
+    """
+    Unit test class.
+    """
+
+    def test_align(self):
+        """
+        Test that the text of parts is split over the sentences.
+        """
+        emitter = TokenizedSentenceEmitter(["Een zin .", "Nog een ."])
+        self.assertEqual(list(emitter.get_sentences("Een ")), ["Een "])
+        self.assertEqual(list(emitter.get_sentences("zin. Nog")),
+                         ["zin .\n", "Nog "])
+        self.assertEqual(list(emitter.get_sentences(" een.")), ["een .\n"])
+        with self.assertRaises(Exception):
+            list(TokenizedSentenceEmitter(["Een zin ."]).get_sentences("Geen"))
+
+    def test_long_division(self):
+        """
+        Test aligning a part spanning thousands of sentences.
+        """
+        sentences = ["Dit is zin {0} .".format(i) for i in range(5000)]
+        emitter = TokenizedSentenceEmitter(sentences)
+        aligned = list(emitter.get_sentences(
+            " ".join("Dit is zin {0}.".format(i) for i in range(5000))))
+        self.assertEqual(aligned, [sentence + "\n" for sentence in sentences])
+
+    def test_corpus(self):
+        """
+        Test reading the documents of a TEI corpus, each with its own texts.
+        """
+        documents = "".join("""<TEI xml:id="doc{0}">
+            <teiHeader><fileDesc><titleStmt><title>Document {0}</title></titleStmt></fileDesc></teiHeader>
+            <text><body><p>Eerste tekst.</p></body></text>
+            <text><body><p>Tweede tekst.</p></body></text>
+            </TEI>""".format(i) for i in range(3))
+        collected_file = CollectedFile(
+            "", "corpus.xml", "",
+            '<teiCorpus xmlns="http://www.tei-c.org/ns/1.0"><teiHeader/>{0}</teiCorpus>'.format(documents))
+
+        reader = TeiReader(RuleTokenizer())
+        for (i, document) in enumerate(reader.read(collected_file)):
+            self.assertEqual(document.metadata["id"].value, "doc{0}".format(i))
+            self.assertEqual(
+                document.metadata["fileDesc::titleStmt::title"].value, "Document {0}".format(i))
+            self.assertEqual(
+                [(utterance.id, utterance.text) for utterance in document.utterances],
+                [("doc{0}".format(i), "Eerste tekst .\n"),
+                 ("doc{0}_1".format(i), "Tweede tekst .\n")])
+        self.assertEqual(i, 2)
+
+    def test_detect_corpus(self):
+        """
+        Test recognizing a TEI corpus with a long header.
+        """
+        header = "<teiHeader><fileDesc><titleStmt><title>Corpus</title></titleStmt>" + \
+            "<sourceDesc>{0}</sourceDesc></fileDesc></teiHeader>".format(
+                "<p>Beschrijving.</p>" * 50)
+        collected_file = CollectedFile(
+            "", "corpus.xml", "",
+            '<teiCorpus xmlns="http://www.tei-c.org/ns/1.0">{0}<TEI>'.format(header) +
+            '<teiHeader/><text><body><p>Een tekst.</p></body></text></TEI></teiCorpus>')
+        self.assertNotIn("<TEI", collected_file.prefix)
+
+        utterances = [[utterance.text for utterance in document.utterances]
+                      for document in AutoReader(RuleTokenizer()).read(collected_file)]
+        self.assertEqual(utterances, [["Een tekst .\n"]])
@@ -0,0 +1,67 @@
+"""
+Unit test for the tokenizer.
+"""
+
+import unittest
+
+from corpus2alpino.readers.tokenizer import RuleTokenizer, Tokenizer
+
+
+class TestTokenizer(unittest.TestCase):
+    """
+    Unit test class.
+    """
+
+    def test_process_all(self):
+        """
+        Test that the texts are tokenized in order, also when they span
+        multiple batches or are repeated.
+        """
+        tokenizer = Tokenizer(batch_size=2, memo_characters=20)
+        texts = ["Dit is een test. Nog een zin!", "Hallo,wereld",
+                 "Dit is een test. Nog een zin!", "Ja.", "Hallo,wereld"]
+        tokenized = [[sentence.text() for sentence in sentences]
+                     for sentences in tokenizer.process_all(texts)]
+        self.assertEqual(tokenized, [
+            ["Dit is een test .", "Nog een zin !"],
+            ["Hallo , wereld"],
+            ["Dit is een test .", "Nog een zin !"],
+            ["Ja ."],
+            ["Hallo , wereld"]])
+        # only the short texts are remembered
+        self.assertEqual(list(tokenizer.memo), ["Ja.", "Hallo,wereld"])
+        self.assertEqual(tokenizer.memo_size, 15)
+        self.assertEqual(
+            [sentence.text() for sentence in tokenizer.process("Hallo,wereld")],
+            ["Hallo , wereld"])
+
+    def test_processes(self):
+        """
+        Test tokenizing large batches using multiple processes.
+        """
+        texts = ["Dit is tekst {0}.".format(i) + " Nog een zin!" * 10 for i in range(3000)]
+        expected = [[sentence.text() for sentence in sentences]
+                    for sentences in Tokenizer().process_all(texts)]
+        tokenizer = Tokenizer(n_process=2)
+        try:
+            self.assertEqual([[sentence.text() for sentence in sentences]
+                              for sentences in tokenizer.process_all(texts)], expected)
+            self.assertIsNotNone(tokenizer._Tokenizer__pool)
+        finally:
+            tokenizer.close()
+
+    def test_rules(self):
+        """
+        Test splitting sentences and tokens using rules.
+        """
+        tokenizer = RuleTokenizer()
+        self.assertEqual(
+            [[sentence.text() for sentence in sentences]
+             for sentences in tokenizer.process_all([
+                 "Dit is een test. Nog een zin!",
+                 "Hij zei: \"Ja.\" Toen kwam dhr. Jansen o.a. om 10.30 uur.",
+                 "'s Avonds met z'n fiets naar www.uu.nl... of niet?!"])],
+            [["Dit is een test .", "Nog een zin !"],
+             ["Hij zei : \" Ja . \"",
+              "Toen kwam dhr. Jansen o.a. om 10.30 uur ."],
+             ["'s Avonds met z'n fiets naar www.uu.nl ... of niet ?!"]])